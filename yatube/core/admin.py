@@ -0,0 +1,46 @@
+import json
+from io import StringIO
+
+from django.contrib import admin
+from django.http import HttpResponse
+from django.utils.html import format_html
+
+from core.flight_recorder import export_jsonl
+from core.models import RequestTrace
+
+
+@admin.register(RequestTrace)
+class RequestTraceAdmin(admin.ModelAdmin):
+    list_display = (
+        'created', 'kind', 'method', 'path', 'view_name', 'status',
+        'duration', 'sql_count', 'sql_time', 'template_time', 'cache_hits',
+        'cache_misses',
+    )
+    list_filter = ('kind', 'view_name', 'status')
+    search_fields = ('path',)
+    exclude = ('trace',)
+    readonly_fields = (
+        'created', 'kind', 'method', 'path', 'view_name', 'status',
+        'duration', 'sql_count', 'sql_time', 'template_time', 'cache_hits',
+        'cache_misses', 'trace_display',
+    )
+    actions = ('export_jsonl',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def trace_display(self, trace):
+        pretty = json.dumps(json.loads(trace.trace), ensure_ascii=False,
+                            indent=2)
+        return format_html('<pre>{}</pre>', pretty)
+    trace_display.short_description = 'Трасса'
+
+    def export_jsonl(self, request, queryset):
+        content = StringIO()
+        export_jsonl(queryset, content)
+        response = HttpResponse(
+            content.getvalue(), content_type='application/x-ndjson')
+        response['Content-Disposition'] = (
+            'attachment; filename="request-traces.jsonl"')
+        return response
+    export_jsonl.short_description = 'Выгрузить в JSONL'
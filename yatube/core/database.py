@@ -0,0 +1,31 @@
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """Применяет SQLITE_PRAGMAS к каждому новому соединению SQLite.
+
+    Подключается к сигналу connection_created в CoreConfig.ready.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+            if name == 'journal_mode':
+                mode = cursor.fetchone()[0]
+                # Базы в памяти (тестовая) остаются в режиме memory.
+                if mode.upper() not in (str(value).upper(), 'MEMORY'):
+                    logger.warning(
+                        'SQLite оставил journal_mode=%s вместо %s',
+                        mode, value)
+
+
+def pragma(connection, name):
+    """Текущее значение PRAGMA соединения."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA {name}')
+        return cursor.fetchone()[0]
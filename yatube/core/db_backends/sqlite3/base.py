@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite, где atomic() открывает транзакцию в SQLITE_TRANSACTION_MODE.
+
+    Отложенная транзакция, которая сначала читает, а потом пишет, при
+    занятой базе сразу падает с «database is locked»: SQLite не ждёт
+    busy_timeout, чтобы не попасть во взаимную блокировку. BEGIN
+    IMMEDIATE берёт блокировку записи в начале и ждёт её.
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {settings.SQLITE_TRANSACTION_MODE}')
@@ -0,0 +1,152 @@
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from core.models import RequestTrace
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FIELDS = (
+    'created', 'kind', 'method', 'path', 'view_name', 'status', 'duration',
+    'sql_count', 'sql_time', 'template_time', 'cache_hits', 'cache_misses',
+)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def explain(sql, params):
+    """Строки EXPLAIN QUERY PLAN или None, если план не получить."""
+    if connection.vendor != 'sqlite' or not sql.lstrip().upper().startswith(
+            ('SELECT', 'WITH')):
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+    except DatabaseError:
+        return None
+
+
+def build_trace(timings):
+    """JSON трассы: все SQL с планами самых долгих и все шаблоны.
+
+    Время отсчитывается от начала запроса, в миллисекундах. Параметры
+    SQL не сохраняются: среди них ключи сессий и хэши паролей, а трассы
+    читают все сотрудники. Нужны они только для EXPLAIN.
+    """
+    slowest = set(sorted(
+        range(len(timings.queries)),
+        key=lambda index: -timings.queries[index][1],
+    )[:settings.FLIGHT_RECORDER_EXPLAIN])
+    queries = []
+    for index, (start, duration, sql, params, many) in enumerate(
+            timings.queries):
+        query = {
+            'at_ms': _ms(start - timings.started),
+            'ms': _ms(duration),
+            'sql': sql,
+        }
+        if index in slowest and not many:
+            query['plan'] = explain(sql, params)
+        queries.append(query)
+    templates = [
+        {
+            'at_ms': _ms(start - timings.started),
+            'ms': _ms(duration),
+            'name': name,
+            'depth': depth,
+        }
+        for start, duration, name, depth in sorted(timings.templates)
+    ]
+    return json.dumps(
+        {'queries': queries, 'templates': templates},
+        ensure_ascii=False, default=str,
+    )
+
+
+def trace_kind(duration):
+    """Вид трассы для запроса длительностью duration секунд или None.
+
+    Решение принимается до разбора трассы, поэтому запросы, которые не
+    сохраняются, больше ничего не стоят.
+    """
+    slow_ms = settings.FLIGHT_RECORDER_SLOW_MS
+    if slow_ms is not None and duration * 1000 >= slow_ms:
+        return RequestTrace.SLOW
+    if random.random() < settings.FLIGHT_RECORDER_SAMPLE_RATE:
+        return RequestTrace.SAMPLE
+    return None
+
+
+def record(kind, request, response, duration, timings):
+    """Сохраняет трассу и обрезает журнал этого вида до его размера."""
+    match = request.resolver_match
+    RequestTrace.objects.create(
+        kind=kind,
+        method=request.method,
+        path=request.get_full_path(),
+        view_name=match.view_name if match else '',
+        status=response.status_code,
+        duration=_ms(duration),
+        sql_count=timings.sql_count,
+        sql_time=_ms(timings.sql_time),
+        template_time=_ms(timings.template_time),
+        cache_hits=timings.cache_hits,
+        cache_misses=timings.cache_misses,
+        trace=build_trace(timings),
+    )
+    if kind == RequestTrace.SLOW:
+        size = settings.FLIGHT_RECORDER_SLOW_SIZE
+        ordering = ('-duration', '-pk')
+    else:
+        size = settings.FLIGHT_RECORDER_SAMPLE_SIZE
+        ordering = ('-created', '-pk')
+    stale = list(
+        RequestTrace.objects.filter(kind=kind).order_by(*ordering)
+        .values_list('pk', flat=True)[size:]
+    )
+    if stale:
+        RequestTrace.objects.filter(pk__in=stale).delete()
+
+
+def export_jsonl(traces, file_):
+    """Пишет трассы в file_ по одной JSON-строке на запрос."""
+    for trace in traces.iterator():
+        line = {field: getattr(trace, field) for field in EXPORT_FIELDS}
+        line['trace'] = json.loads(trace.trace)
+        file_.write(
+            json.dumps(line, ensure_ascii=False, default=str) + '\n')
+
+
+class FlightRecorderMiddleware:
+    """Журнал медленных запросов и случайной выборки остальных.
+
+    Берёт счётчики из request.server_timings, поэтому ставится перед
+    core.timing.ServerTimingMiddleware: его собственные запросы к БД
+    не попадают ни в Server-Timing, ни в трассу.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+        timings = getattr(request, 'server_timings', None)
+        if timings is None:
+            return response
+        kind = trace_kind(duration)
+        if kind is not None:
+            try:
+                record(kind, request, response, duration, timings)
+            except DatabaseError:
+                logger.exception(
+                    'Не удалось сохранить трассу %s', request.path)
+        return response
@@ -0,0 +1,97 @@
+import multiprocessing
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import measure, median
+from core.cache_backends.sqlite import SQLiteCache
+
+COUNTER_KEY = 'bench-counter'
+
+
+def _increment(backend_class, location, params, times):
+    cache = backend_class(location, params)
+    for _ in range(times):
+        cache.incr(COUNTER_KEY)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает SQLiteCache с LocMemCache и FileBasedCache на '
+        'get/set, get_many/set_many и incr, а затем проверяет общий '
+        'счётчик, который увеличивают несколько процессов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument('--batch', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--increments', type=int, default=500)
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp(prefix='bench-cache-')
+        try:
+            backends = (
+                ('locmem', LocMemCache, 'bench'),
+                ('filebased', FileBasedCache, f'{directory}/files'),
+                ('sqlite', SQLiteCache, f'{directory}/cache.sqlite3'),
+            )
+            self.stdout.write(
+                f'{"бэкенд":>10} {"set":>9} {"get":>9} {"set_many":>9} '
+                f'{"get_many":>9} {"incr":>9}   (мс на 1000 операций)')
+            params = {'OPTIONS': {'MAX_ENTRIES': options['keys'] * 2}}
+            for name, backend_class, location in backends:
+                cache = backend_class(location, params)
+                self.stdout.write(f'{name:>10} ' + ' '.join(
+                    f'{value:>9.2f}' for value in self.run(cache, options)))
+            self.run_shared(SQLiteCache, f'{directory}/cache.sqlite3',
+                            options)
+        finally:
+            shutil.rmtree(directory)
+
+    def run(self, cache, options):
+        keys = [f'bench-{number}' for number in range(options['keys'])]
+        value = {'content': 'x' * 1024}
+        batches = [
+            keys[start:start + options['batch']]
+            for start in range(0, len(keys), options['batch'])
+        ]
+        cache.set(COUNTER_KEY, 0, None)
+        operations = (
+            lambda: [cache.set(key, value) for key in keys],
+            lambda: [cache.get(key) for key in keys],
+            lambda: [cache.set_many(dict.fromkeys(batch, value))
+                     for batch in batches],
+            lambda: [cache.get_many(batch) for batch in batches],
+            lambda: [cache.incr(COUNTER_KEY) for _ in keys],
+        )
+        return [
+            median(measure(operation, options['repeat'])) * 1000 / len(keys)
+            for operation in operations
+        ]
+
+    def run_shared(self, backend_class, location, options):
+        cache = backend_class(location, {})
+        cache.set(COUNTER_KEY, 0, None)
+        start = time.perf_counter()
+        workers = [
+            multiprocessing.Process(target=_increment, args=(
+                backend_class, location, {}, options['increments']))
+            for _ in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        expected = options['processes'] * options['increments']
+        self.stdout.write(
+            f'\nsqlite: {options["processes"]} процесса увеличили счётчик '
+            f'до {cache.get(COUNTER_KEY)} из {expected} '
+            f'за {elapsed * 1000:.0f} мс'
+        )
@@ -0,0 +1,179 @@
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.benchmarks import benchmark_database, percentile
+from core.database import pragma
+from posts import seeding
+from posts.models import Follow, Group, Post
+from posts.query_plans import view_requests
+
+# Представления, которые на GET пишут в базу.
+WRITING_GETS = {'posts:profile_follow', 'posts:profile_unfollow'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает файловую базу SQLite из нескольких процессов смесью '
+        'чтений и записей: сначала с настройками SQLite по умолчанию, '
+        'отложенными транзакциями и новым соединением на каждый запрос, '
+        'затем с SQLITE_PRAGMAS, SQLITE_TRANSACTION_MODE и CONN_MAX_AGE. '
+        'Показывает пропускную способность, задержки и число ошибок '
+        '«database is locked».'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Секунд нагрузки на каждый режим.',
+        )
+        parser.add_argument(
+            '--write-share', type=float, default=0.2,
+            help='Доля пишущих запросов.',
+        )
+        parser.add_argument('--posts', type=int, default=1000)
+
+    def modes(self):
+        return (
+            ('по умолчанию', {}, 'DEFERRED', 0),
+            ('WAL', settings.SQLITE_PRAGMAS, settings.SQLITE_TRANSACTION_MODE,
+             settings.DATABASES['default'].get('CONN_MAX_AGE', 0)),
+        )
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp(prefix='bench-sqlite-')
+        settings_dict = connection.settings_dict
+        old_max_age = settings_dict['CONN_MAX_AGE']
+        try:
+            caches = {'default': {
+                'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+                'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+            }}
+            self.stdout.write(
+                f'{"режим":>13} {"журнал":>7} {"запр/с":>8} {"чтен/с":>8} '
+                f'{"запис/с":>8} {"p50 чт":>7} {"p95 чт":>7} '
+                f'{"p95 зап":>8} {"locked":>7} {"ошибки":>7}')
+            for index, mode in enumerate(self.modes()):
+                title, pragmas, transaction_mode, max_age = mode
+                settings_dict['CONN_MAX_AGE'] = max_age
+                with override_settings(
+                        DEBUG=False, CACHES=caches, SQLITE_PRAGMAS=pragmas,
+                        SQLITE_TRANSACTION_MODE=transaction_mode,
+                        METRICS_DIR=None), benchmark_database(
+                            name=os.path.join(directory, f'{index}.sqlite3')):
+                    cache.clear()
+                    seeding.seed(
+                        users=100, groups=5, posts=options['posts'],
+                        comments=options['posts'], follows=5, image_share=0,
+                    )
+                    journal_mode = pragma(connection, 'journal_mode')
+                    result = self.run(options)
+                self.report(title, journal_mode, result, options['duration'])
+        finally:
+            settings_dict['CONN_MAX_AGE'] = old_max_age
+            shutil.rmtree(directory)
+
+    def requests(self):
+        """(клиент, метод, URL, данные, пишет ли) для смеси нагрузки."""
+        reader = Follow.objects.order_by('pk').first().user
+        author = Post.objects.order_by('-pk').first().author
+        post = Post.objects.filter(author=author).order_by('-pk').first()
+        group = Group.objects.order_by('pk').first()
+        clients = {}
+        requests = []
+        for user, method, name, kwargs, data in view_requests(
+                post, group, author, reader):
+            if name in WRITING_GETS:
+                continue
+            if user not in clients:
+                clients[user] = Client()
+                if user is not None:
+                    clients[user].force_login(user)
+            requests.append((
+                clients[user], method, reverse(name, kwargs=kwargs), data,
+                method == 'post',
+            ))
+        return requests
+
+    def run(self, options):
+        requests = self.requests()
+        reads = [request for request in requests if not request[-1]]
+        writes = [request for request in requests if request[-1]]
+        # Процессы получают копию соединения при fork: закрываем его,
+        # каждый откроет своё.
+        connection.close()
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        start = time.time() + 0.5
+        deadline = start + options['duration']
+        workers = [
+            context.Process(target=self.worker, args=(
+                results, reads, writes, options['write_share'],
+                start, deadline, number,
+            ))
+            for number in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+        total = {'read': [], 'write': [], 'locked': 0, 'errors': 0}
+        for _ in workers:
+            result = results.get()
+            for key, value in result.items():
+                total[key] += value
+        for worker in workers:
+            worker.join()
+        return total
+
+    @staticmethod
+    def worker(results, reads, writes, write_share, start, deadline, seed):
+        rng = random.Random(seed)
+        result = {'read': [], 'write': [], 'locked': 0, 'errors': 0}
+        time.sleep(max(0, start - time.time()))
+        try:
+            while time.time() < deadline:
+                is_write = rng.random() < write_share
+                client, method, url, data, _ = rng.choice(
+                    writes if is_write else reads)
+                began = time.perf_counter()
+                try:
+                    response = getattr(client, method)(url, data)
+                except OperationalError as error:
+                    if 'locked' not in str(error):
+                        raise
+                    result['locked'] += 1
+                    continue
+                except Exception:
+                    result['errors'] += 1
+                    continue
+                if response.status_code >= 400:
+                    result['errors'] += 1
+                    continue
+                result['write' if is_write else 'read'].append(
+                    (time.perf_counter() - began) * 1000)
+        finally:
+            connection.close()
+            results.put(result)
+
+    def report(self, title, journal_mode, result, duration):
+        reads, writes = result['read'], result['write']
+        self.stdout.write(
+            f'{title:>13} {journal_mode:>7} '
+            f'{(len(reads) + len(writes)) / duration:>8.1f} '
+            f'{len(reads) / duration:>8.1f} {len(writes) / duration:>8.1f} '
+            f'{percentile(reads, 0.5) if reads else 0:>7.1f} '
+            f'{percentile(reads, 0.95) if reads else 0:>7.1f} '
+            f'{percentile(writes, 0.95) if writes else 0:>8.1f} '
+            f'{result["locked"]:>7} {result["errors"]:>7}'
+        )
@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.benchmarks import benchmark_database, median, percentile
+from posts import seeding
+from posts.models import Follow, Post
+
+TIMING_MIDDLEWARE = 'core.timing.ServerTimingMiddleware'
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет накладные расходы ServerTimingMiddleware: одни и те же '
+        'страницы запрашиваются попеременно клиентом с ним и без него. '
+        'Без middleware бэкенды шаблонов и кэша только проверяют, что '
+        'замера нет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=300)
+        parser.add_argument('--posts', type=int, default=500)
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp(prefix='bench-timing-')
+        try:
+            caches = {'default': {
+                'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+                'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+            }}
+            # Запросы замера не попадают в метрики и журнал медленных
+            # запросов сайта.
+            with benchmark_database(), override_settings(
+                    DEBUG=False, CACHES=caches, METRICS_DIR=None,
+                    FLIGHT_RECORDER_SLOW_MS=None,
+                    FLIGHT_RECORDER_SAMPLE_RATE=0):
+                seeding.seed(
+                    users=50, groups=5, posts=options['posts'],
+                    comments=options['posts'], follows=5, image_share=0,
+                )
+                self.run(options['repeat'])
+        finally:
+            shutil.rmtree(directory)
+
+    def pages(self):
+        post = Post.objects.order_by('-comments_count').first()
+        reader = Follow.objects.order_by('pk').first().user
+        return (
+            ('главная', None, reverse('posts:index')),
+            ('пост', None, reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk})),
+            ('подписки', reader, reverse('posts:follow_index')),
+        )
+
+    @staticmethod
+    def client(user, url, plain):
+        """Клиент, уже собравший цепочку middleware по MIDDLEWARE."""
+        middleware = [
+            name for name in settings.MIDDLEWARE
+            if not plain or name != TIMING_MIDDLEWARE
+        ]
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        with override_settings(MIDDLEWARE=middleware):
+            client.get(url)
+        return client
+
+    def run(self, repeat):
+        self.stdout.write(
+            f'{"страница":>10} {"без, мс":>9} {"с замером, мс":>14} '
+            f'{"разница, мкс":>13} {"p95 без":>9} {"p95 с":>8}')
+        for title, user, url in self.pages():
+            clients = {
+                plain: self.client(user, url, plain)
+                for plain in (True, False)
+            }
+            samples = {True: [], False: []}
+            for step in range(repeat * 2):
+                plain = bool(step % 2)
+                samples[plain].append(self.sample(clients[plain], url))
+            plain, timed = samples[True], samples[False]
+            self.stdout.write(
+                f'{title:>10} {median(plain):>9.3f} {median(timed):>14.3f} '
+                f'{(median(timed) - median(plain)) * 1000:>13.1f} '
+                f'{percentile(plain, 0.95):>9.3f} '
+                f'{percentile(timed, 0.95):>8.3f}'
+            )
+
+    @staticmethod
+    def sample(client, url):
+        start = time.perf_counter()
+        client.get(url)
+        return (time.perf_counter() - start) * 1000
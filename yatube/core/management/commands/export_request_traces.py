@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from core.flight_recorder import export_jsonl
+from core.models import RequestTrace
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает журнал медленных запросов в JSONL: одна строка на '
+        'запрос со всеми SQL, планами и шаблонами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind', choices=(RequestTrace.SLOW, RequestTrace.SAMPLE))
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для выгрузки; по умолчанию stdout.',
+        )
+
+    def handle(self, *args, **options):
+        traces = RequestTrace.objects.order_by('-duration')
+        if options['kind']:
+            traces = traces.filter(kind=options['kind'])
+        if options['output'] == '-':
+            export_jsonl(traces, self.stdout)
+            return
+        with open(options['output'], 'w') as file_:
+            export_jsonl(traces, file_)
@@ -0,0 +1,344 @@
+import bisect
+import functools
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+
+from core import timing
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+INITIAL_SIZE = 1 << 16
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1 << 10, 4 << 10, 16 << 10, 64 << 10, 256 << 10, 1 << 20)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_USED = struct.Struct('<I4x')
+_KEY_LENGTH = struct.Struct('<I')
+_VALUE = struct.Struct('<d')
+
+_lock = threading.Lock()
+_file = None
+_file_pid = None
+
+
+def _entries(data, used):
+    """(ключ, значение, смещение значения) записей файла метрик."""
+    offset = _USED.size
+    while offset < used:
+        length = _KEY_LENGTH.unpack_from(data, offset)[0]
+        start = offset + _KEY_LENGTH.size
+        key = bytes(data[start:start + length]).decode()
+        offset = start + length
+        offset += -offset % _VALUE.size
+        yield key, _VALUE.unpack_from(data, offset)[0], offset
+        offset += _VALUE.size
+
+
+class MetricsFile:
+    """Значения метрик одного процесса в файле, отображённом в память.
+
+    После заголовка с числом занятых байт идут записи: длина ключа,
+    ключ в UTF-8, выравнивание до 8 байт и double. Новый ключ
+    дописывается в конец, заголовок обновляется последним, поэтому
+    другие процессы читают только целые записи.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = os.fstat(self._fd).st_size
+        if size < INITIAL_SIZE:
+            size = INITIAL_SIZE
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._used = _USED.unpack_from(self._map)[0] or _USED.size
+        self._offsets = {
+            key: offset for key, _, offset in _entries(self._map, self._used)}
+
+    def add(self, key, amount):
+        offset = self._offsets.get(key)
+        if offset is None:
+            offset = self._append(key)
+        value = _VALUE.unpack_from(self._map, offset)[0]
+        _VALUE.pack_into(self._map, offset, value + amount)
+
+    def _append(self, key):
+        encoded = key.encode()
+        offset = self._used + _KEY_LENGTH.size + len(encoded)
+        offset += -offset % _VALUE.size
+        used = offset + _VALUE.size
+        if used > len(self._map):
+            size = len(self._map)
+            while size < used:
+                size *= 2
+            self._map.close()
+            os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, size)
+        _KEY_LENGTH.pack_into(self._map, self._used, len(encoded))
+        start = self._used + _KEY_LENGTH.size
+        self._map[start:start + len(encoded)] = encoded
+        _VALUE.pack_into(self._map, offset, 0.0)
+        self._used = used
+        _USED.pack_into(self._map, 0, used)
+        self._offsets[key] = offset
+        return offset
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+
+def _process_file():
+    """Файл текущего процесса в METRICS_DIR; после fork — новый.
+
+    Вызывается под _lock. None, если метрики выключены.
+    """
+    global _file, _file_pid
+    directory = settings.METRICS_DIR
+    if directory is None:
+        return None
+    path = os.path.join(directory, f'{os.getpid()}.db')
+    if _file is None or _file_pid != os.getpid() or _file.path != path:
+        os.makedirs(directory, exist_ok=True)
+        if _file is not None and _file_pid == os.getpid():
+            _file.close()
+        _file = MetricsFile(path)
+        _file_pid = os.getpid()
+    return _file
+
+
+def add(updates):
+    """Прибавляет значения [(ключ, приращение)] под одной блокировкой."""
+    with _lock:
+        file_ = _process_file()
+        if file_ is None:
+            return
+        for key, amount in updates:
+            file_.add(key, amount)
+
+
+def read_values(directory=None):
+    """Суммы значений по файлам всех процессов.
+
+    Возвращает {имя сэмпла: {кортеж пар (метка, значение): число}}.
+    """
+    directory = directory or settings.METRICS_DIR
+    values = {}
+    if directory is None:
+        return values
+    for path in sorted(glob.glob(os.path.join(directory, '*.db'))):
+        with open(path, 'rb') as file_:
+            data = file_.read()
+        if len(data) < _USED.size:
+            continue
+        for key, value, _ in _entries(data, _USED.unpack_from(data)[0]):
+            name, labels = json.loads(key)
+            samples = values.setdefault(name, {})
+            labels = tuple(map(tuple, labels))
+            samples[labels] = samples.get(labels, 0) + value
+    return values
+
+
+@functools.lru_cache(maxsize=4096)
+def _key(name, labels):
+    """Ключ записи в файле; кэшируется, чтобы не собирать JSON на
+    каждом запросе."""
+    return json.dumps([name, labels], ensure_ascii=False)
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def _escape(value):
+    return (
+        value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"'))
+
+
+def _sample(name, labels, value):
+    if labels:
+        pairs = ','.join(
+            f'{label}="{_escape(label_value)}"'
+            for label, label_value in labels)
+        name = f'{name}{{{pairs}}}'
+    return f'{name} {_number(value)}'
+
+
+REGISTRY = []
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        REGISTRY.append(self)
+
+    def label_pairs(self, labels):
+        return tuple((label, str(labels[label])) for label in self.labels)
+
+    def samples(self, values):
+        raise NotImplementedError
+
+    def exposition(self, values):
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.type}',
+            *self.samples(values),
+        ]
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def updates(self, amount=1, **labels):
+        return [(_key(self.name, self.label_pairs(labels)), amount)]
+
+    def inc(self, amount=1, **labels):
+        add(self.updates(amount, **labels))
+
+    def samples(self, values):
+        return [
+            _sample(self.name, labels, value)
+            for labels, value in sorted(values.get(self.name, {}).items())
+        ]
+
+
+class Histogram(Metric):
+    """Гистограмма; в файле хранится число попаданий в каждую корзину,
+    накопленные суммы считаются при выдаче.
+    """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=()):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        self.bounds = [_number(bound) for bound in buckets] + ['+Inf']
+
+    def updates(self, value, **labels):
+        pairs = self.label_pairs(labels)
+        bound = self.bounds[bisect.bisect_left(self.buckets, value)]
+        return [
+            (_key(f'{self.name}_bucket', pairs + (('le', bound),)), 1),
+            (_key(f'{self.name}_sum', pairs), value),
+        ]
+
+    def observe(self, value, **labels):
+        add(self.updates(value, **labels))
+
+    def samples(self, values):
+        buckets = {}
+        for labels, count in values.get(f'{self.name}_bucket', {}).items():
+            *pairs, (_, bound) = labels
+            buckets.setdefault(tuple(pairs), {})[bound] = count
+        sums = values.get(f'{self.name}_sum', {})
+        lines = []
+        for labels, counts in sorted(buckets.items()):
+            total = 0
+            for bound in self.bounds:
+                total += counts.get(bound, 0)
+                lines.append(_sample(
+                    f'{self.name}_bucket', labels + (('le', bound),), total))
+            lines.append(_sample(
+                f'{self.name}_sum', labels, sums.get(labels, 0)))
+            lines.append(_sample(f'{self.name}_count', labels, total))
+        return lines
+
+
+class Ratio(Metric):
+    """Доля hits / (hits + misses) по накопленным счётчикам."""
+    type = 'gauge'
+
+    def __init__(self, name, documentation, hits, misses):
+        super().__init__(name, documentation, hits.labels)
+        self.hits = hits
+        self.misses = misses
+
+    def samples(self, values):
+        hits = values.get(self.hits.name, {})
+        misses = values.get(self.misses.name, {})
+        lines = []
+        for labels in sorted(hits.keys() | misses.keys()):
+            total = hits.get(labels, 0) + misses.get(labels, 0)
+            if total:
+                lines.append(_sample(
+                    self.name, labels, hits.get(labels, 0) / total))
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    'yatube_request_duration_seconds', 'Время ответа по имени URL.',
+    ('view',), DURATION_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'yatube_response_size_bytes', 'Размер тела ответа по имени URL.',
+    ('view',), SIZE_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'yatube_db_queries', 'SQL-запросов на ответ по имени URL.',
+    ('view',), QUERY_BUCKETS,
+)
+CACHE_HITS = Counter(
+    'yatube_cache_hits_total', 'Попаданий в кэш по имени URL.', ('view',))
+CACHE_MISSES = Counter(
+    'yatube_cache_misses_total', 'Промахов кэша по имени URL.', ('view',))
+CACHE_HIT_RATIO = Ratio(
+    'yatube_cache_hit_ratio',
+    'Доля попаданий в кэш по имени URL за время жизни счётчиков.',
+    CACHE_HITS, CACHE_MISSES,
+)
+THUMBNAILS_GENERATED = Counter(
+    'yatube_thumbnails_generated_total', 'Созданных миниатюр по формату.',
+    ('format',),
+)
+
+
+def exposition():
+    """Текст в формате Prometheus по всем процессам."""
+    values = read_values()
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.exposition(values))
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """Гистограммы времени, размера ответа и SQL по имени URL.
+
+    SQL и обращения к кэшу берёт из request.server_timings, поэтому
+    ставится перед core.timing.ServerTimingMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match else timing.UNRESOLVED
+        updates = REQUEST_DURATION.updates(duration, view=view)
+        if not response.streaming:
+            updates += RESPONSE_SIZE.updates(len(response.content), view=view)
+        timings = getattr(request, 'server_timings', None)
+        if timings is not None:
+            updates += DB_QUERIES.updates(timings.sql_count, view=view)
+            if timings.cache_hits:
+                updates += CACHE_HITS.updates(timings.cache_hits, view=view)
+            if timings.cache_misses:
+                updates += CACHE_MISSES.updates(
+                    timings.cache_misses, view=view)
+        add(updates)
+        return response
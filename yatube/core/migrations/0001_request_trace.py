@@ -0,0 +1,46 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestTrace',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Время')),
+                ('kind', models.CharField(choices=[('slow', 'Медленный'), ('sample', 'Случайный')], max_length=10, verbose_name='Вид')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.TextField(verbose_name='Адрес')),
+                ('view_name', models.CharField(max_length=200, verbose_name='Представление')),
+                ('status', models.PositiveSmallIntegerField(verbose_name='Статус')),
+                ('duration', models.FloatField(verbose_name='Время, мс')),
+                ('sql_count', models.PositiveIntegerField(verbose_name='SQL-запросов')),
+                ('sql_time', models.FloatField(verbose_name='Время SQL, мс')),
+                ('template_time', models.FloatField(verbose_name='Время шаблонов, мс')),
+                ('cache_hits', models.PositiveIntegerField(verbose_name='Попаданий в кэш')),
+                ('cache_misses', models.PositiveIntegerField(verbose_name='Промахов кэша')),
+                ('trace', models.TextField(help_text='JSON: SQL-запросы с планами самых долгих и шаблоны', verbose_name='Трасса')),
+            ],
+            options={
+                'verbose_name': 'Трасса запроса',
+                'verbose_name_plural': 'Трассы запросов',
+                'ordering': ('-created',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='requesttrace',
+            index=models.Index(fields=['kind', 'duration'], name='trace_kind_duration_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requesttrace',
+            index=models.Index(fields=['kind', 'created'], name='trace_kind_created_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import models
+
+
+class RequestTrace(models.Model):
+    """Запрос из журнала медленных запросов (flight recorder).
+
+    Медленные запросы (kind = slow) хранятся по убыванию времени, выборка
+    остальных (kind = sample) — по кругу, сколько задано в настройках
+    FLIGHT_RECORDER_*.
+    """
+    SLOW = 'slow'
+    SAMPLE = 'sample'
+    KINDS = (
+        (SLOW, 'Медленный'),
+        (SAMPLE, 'Случайный'),
+    )
+
+    class Meta:
+        ordering = ('-created',)
+        indexes = (
+            models.Index(
+                fields=('kind', 'duration'), name='trace_kind_duration_idx'),
+            models.Index(
+                fields=('kind', 'created'), name='trace_kind_created_idx'),
+        )
+        verbose_name = 'Трасса запроса'
+        verbose_name_plural = 'Трассы запросов'
+
+    created = models.DateTimeField('Время', auto_now_add=True)
+    kind = models.CharField('Вид', max_length=10, choices=KINDS)
+    method = models.CharField('Метод', max_length=10)
+    path = models.TextField('Адрес')
+    view_name = models.CharField('Представление', max_length=200)
+    status = models.PositiveSmallIntegerField('Статус')
+    duration = models.FloatField('Время, мс')
+    sql_count = models.PositiveIntegerField('SQL-запросов')
+    sql_time = models.FloatField('Время SQL, мс')
+    template_time = models.FloatField('Время шаблонов, мс')
+    cache_hits = models.PositiveIntegerField('Попаданий в кэш')
+    cache_misses = models.PositiveIntegerField('Промахов кэша')
+    trace = models.TextField(
+        'Трасса',
+        help_text='JSON: SQL-запросы с планами самых долгих и шаблоны',
+    )
+
+    def __str__(self):
+        return f'{self.method} {self.path} {self.duration:.0f} мс'
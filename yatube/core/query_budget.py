@@ -0,0 +1,47 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def query_budget(limit):
+    """Наибольшее число запросов к БД, которое может сделать представление.
+
+    Ставится самым внешним декоратором: лимит хранится в атрибуте
+    функции, которую вызывает URL.
+    """
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+class QueryBudgetMiddleware:
+    """Пишет в лог запросы, превысившие бюджет своего представления.
+
+    Запросы не оборачивает сам, а берёт счётчик SQL из
+    request.server_timings, поэтому ставится после
+    core.timing.ServerTimingMiddleware. Считаются только запросы внутри
+    этого слоя, как и раньше: сохранение сессии снаружи не входит.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = getattr(request, 'server_timings', None)
+        if timings is None:
+            return self.get_response(request)
+        before = timings.sql_count
+        response = self.get_response(request)
+        request.query_count = count = timings.sql_count - before
+        budget = getattr(request, 'query_budget', None)
+        if budget is not None and count > budget:
+            logger.warning(
+                'Превышен бюджет запросов: %s сделал %d из %d (%s)',
+                request.resolver_match.view_name, count, budget,
+                request.get_full_path(),
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, 'query_budget', None)
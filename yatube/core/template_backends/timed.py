@@ -0,0 +1,48 @@
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import (
+    DjangoTemplates, Template, reraise,
+)
+
+from core import timing
+
+
+class TimedTemplate(Template):
+    """Шаблон, время отрисовки которого попадает в Server-Timing.
+
+    Считается только внешняя отрисовка: render_to_string внутри тега
+    уже входит во время страницы. В это время входят и SQL-запросы
+    ленивых queryset'ов шаблона.
+    """
+
+    def render(self, context=None, request=None):
+        timings = timing.current()
+        if timings is None:
+            return super().render(context, request)
+        depth = timings.template_depth
+        timings.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            duration = time.perf_counter() - start
+            timings.template_depth = depth
+            if not depth:
+                timings.template_time += duration
+            timings.templates.append(
+                (start, duration, self.origin.template_name, depth))
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates, отдающий TimedTemplate."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(
+                self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
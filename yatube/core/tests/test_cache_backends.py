@@ -0,0 +1,80 @@
+import multiprocessing
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from core.cache_backends.sqlite import SQLiteCache
+
+
+def _increment(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = f'{self.directory}/cache.sqlite3'
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_values_shared_between_instances(self):
+        """Второе подключение к файлу видит записанные значения."""
+        self.cache.set_many({'a': 1, 'b': {'text': 'пост'}})
+        self.assertEqual(
+            self.make_cache().get_many(['a', 'b', 'c']),
+            {'a': 1, 'b': {'text': 'пост'}},
+        )
+
+    def test_incr_is_atomic_across_processes(self):
+        """Счётчик не теряет увеличений из разных процессов."""
+        self.cache.set('counter', 0, None)
+        workers = [
+            multiprocessing.Process(
+                target=_increment, args=(self.location, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_incr_missing_key(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expired_values_are_gone(self):
+        self.cache.set('short', 1, 0.05)
+        self.assertTrue(self.cache.add('short-add', 1, 0.05))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('short-add', 2))
+        self.assertEqual(self.cache.get('short-add'), 2)
+
+    def test_least_recently_used_evicted(self):
+        """При переполнении удаляются записи, которые давно не читали."""
+        cache = self.make_cache(MAX_ENTRIES=3, CULL_FREQUENCY=3)
+        cache.set('old', 1)
+        cache._db.execute("UPDATE cache SET accessed = 0 WHERE key = ':1:old'")
+        cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertIsNone(cache.get('old'))
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {
+            'a': 1, 'b': 2, 'c': 3})
+
+    def test_size_limit(self):
+        """Суммарный размер значений не превышает MAX_SIZE."""
+        cache = self.make_cache(MAX_SIZE=10000)
+        for number in range(20):
+            cache.set(number, 'x' * 1000)
+        size = cache._db.execute(
+            'SELECT SUM(size) FROM cache').fetchone()[0]
+        self.assertLessEqual(size, 10000)
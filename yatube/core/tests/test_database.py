@@ -0,0 +1,71 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from http import HTTPStatus
+from unittest import mock
+
+from django.conf import settings
+from django.db import (
+    DEFAULT_DB_ALIAS, DatabaseError, connection, connections,
+)
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.database import pragma
+
+
+class SQLiteTuningTests(TestCase):
+    def file_connection(self):
+        """Соединение с файловой базой: у базы в памяти нет WAL."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        wrapper = type(connections[DEFAULT_DB_ALIAS])
+        file_connection = wrapper(dict(
+            connection.settings_dict,
+            NAME=os.path.join(directory, 'db.sqlite3'),
+        ), alias='file')
+        self.addCleanup(file_connection.close)
+        return file_connection
+
+    def test_pragmas_applied(self):
+        """Новое соединение получает WAL и остальные PRAGMA."""
+        file_connection = self.file_connection()
+        self.assertEqual(pragma(file_connection, 'journal_mode'), 'wal')
+        self.assertEqual(
+            pragma(file_connection, 'busy_timeout'),
+            settings.SQLITE_PRAGMAS['busy_timeout'],
+        )
+        self.assertEqual(
+            pragma(file_connection, 'cache_size'),
+            settings.SQLITE_PRAGMAS['cache_size'],
+        )
+        self.assertEqual(pragma(file_connection, 'synchronous'), 1)
+
+    def test_immediate_transactions(self):
+        """atomic() сразу берёт блокировку записи: второй писатель
+        не может начать транзакцию."""
+        file_connection = self.file_connection()
+        file_connection.ensure_connection()
+        other = sqlite3.connect(
+            file_connection.settings_dict['NAME'], timeout=0,
+            isolation_level=None)
+        self.addCleanup(other.close)
+        file_connection.set_autocommit(False)
+        file_connection._start_transaction_under_autocommit()
+        with self.assertRaises(sqlite3.OperationalError):
+            other.execute('BEGIN IMMEDIATE')
+        file_connection.rollback()
+
+    def test_health_check(self):
+        response = Client().get(reverse('health'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['status'], 'ok')
+
+    def test_health_check_database_down(self):
+        with mock.patch(
+                'core.views.pragma', side_effect=DatabaseError('нет базы')):
+            response = Client().get(reverse('health'))
+        self.assertEqual(
+            response.status_code, HTTPStatus.SERVICE_UNAVAILABLE)
+        self.assertEqual(response.json()['status'], 'error')
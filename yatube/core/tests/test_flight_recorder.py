@@ -0,0 +1,115 @@
+import json
+from http import HTTPStatus
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.models import RequestTrace
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+class FlightRecorderTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        Post.objects.create(text='Тестовый пост', author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    @override_settings(FLIGHT_RECORDER_SLOW_MS=0)
+    def test_slow_request_traced(self):
+        """Медленный запрос сохраняется со всеми SQL, планами и
+        шаблонами."""
+        self.reader_client.get(reverse('posts:follow_index'))
+        trace = RequestTrace.objects.get()
+        self.assertEqual(trace.kind, RequestTrace.SLOW)
+        self.assertEqual(trace.view_name, 'posts:follow_index')
+        details = json.loads(trace.trace)
+        self.assertEqual(len(details['queries']), trace.sql_count)
+        plans = [
+            query['plan'] for query in details['queries'] if 'plan' in query]
+        self.assertTrue(plans)
+        self.assertIn(
+            'posts/follow.html',
+            [template['name'] for template in details['templates']],
+        )
+
+    @override_settings(FLIGHT_RECORDER_SLOW_MS=0)
+    def test_params_not_stored(self):
+        """Параметры SQL, в том числе ключ сессии, в трассу не попадают."""
+        self.reader_client.get(reverse('posts:follow_index'))
+        trace = RequestTrace.objects.get()
+        session_key = self.reader_client.session.session_key
+        self.assertIn('django_session', trace.trace)
+        self.assertNotIn(session_key, trace.trace)
+        for query in json.loads(trace.trace)['queries']:
+            self.assertNotIn('params', query)
+
+    @override_settings(
+        FLIGHT_RECORDER_SLOW_MS=0, FLIGHT_RECORDER_SLOW_SIZE=2)
+    def test_keeps_slowest(self):
+        """Из медленных хранятся только самые долгие."""
+        for _ in range(4):
+            self.reader_client.get(reverse('posts:index'))
+        self.assertEqual(RequestTrace.objects.count(), 2)
+
+    @override_settings(
+        FLIGHT_RECORDER_SAMPLE_RATE=1, FLIGHT_RECORDER_SAMPLE_SIZE=2)
+    def test_sample_ring(self):
+        """Случайная выборка хранится по кругу: только последние."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            self.reader_client.get(url)
+        self.assertEqual(
+            list(RequestTrace.objects.filter(
+                kind=RequestTrace.SAMPLE).values_list('path', flat=True)),
+            urls[:0:-1],
+        )
+
+    def test_unsampled_requests_not_stored(self):
+        """Без выборки и медленных запросов журнал не пишется."""
+        self.reader_client.get(reverse('posts:index'))
+        self.assertFalse(RequestTrace.objects.exists())
+
+    @override_settings(FLIGHT_RECORDER_SLOW_MS=0)
+    def test_admin_and_export(self):
+        """Журнал виден в админке и выгружается в JSONL."""
+        self.reader_client.get(reverse('posts:follow_index'))
+        trace = RequestTrace.objects.get()
+        admin_client = Client()
+        admin_client.force_login(self.admin)
+        response = admin_client.get(
+            reverse('admin:core_requesttrace_change', args=(trace.pk,)))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'posts/follow.html')
+        response = admin_client.post(
+            reverse('admin:core_requesttrace_changelist'),
+            {'action': 'export_jsonl', '_selected_action': [trace.pk]},
+        )
+        lines = response.content.decode().splitlines()
+        self.assertEqual(json.loads(lines[0])['path'], trace.path)
+        stdout = StringIO()
+        call_command('export_request_traces', stdout=stdout)
+        self.assertIn(
+            'posts:follow_index',
+            [json.loads(line)['view_name']
+             for line in stdout.getvalue().splitlines()],
+        )
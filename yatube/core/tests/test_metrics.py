@@ -0,0 +1,117 @@
+import multiprocessing
+import re
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from posts.models import Post
+from posts.tests.utils import uploaded_gif
+from posts.thumbnails import card_variants, generate
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def sample(text, name):
+    match = re.search(rf'^{re.escape(name)} (\S+)$', text, re.MULTILINE)
+    return None if match is None else float(match.group(1))
+
+
+def count_hits():
+    metrics.CACHE_HITS.inc(2, view='posts:index')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(text='Тестовый пост', author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_override = override_settings(METRICS_DIR=directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = Client()
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return response.content.decode()
+
+    def test_request_metrics(self):
+        """Гистограммы времени, размера и SQL, кэш по имени URL."""
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('posts:index'))
+        text = self.scrape()
+        view = '{view="posts:index"}'
+        self.assertEqual(
+            sample(text, f'yatube_request_duration_seconds_count{view}'), 2)
+        self.assertEqual(
+            sample(text, 'yatube_request_duration_seconds_bucket'
+                         '{view="posts:index",le="+Inf"}'), 2)
+        self.assertEqual(
+            sample(text, f'yatube_response_size_bytes_sum{view}'),
+            2 * len(response.content),
+        )
+        self.assertGreater(sample(text, f'yatube_db_queries_sum{view}'), 0)
+        hits = sample(text, f'yatube_cache_hits_total{view}')
+        misses = sample(text, f'yatube_cache_misses_total{view}')
+        self.assertGreater(hits, 0)
+        self.assertAlmostEqual(
+            sample(text, f'yatube_cache_hit_ratio{view}'),
+            hits / (hits + misses),
+        )
+
+    def test_buckets_are_cumulative(self):
+        for value in (0, 3, 3, 1000):
+            metrics.DB_QUERIES.observe(value, view='test')
+        text = self.scrape()
+        counts = [
+            sample(text, f'yatube_db_queries_bucket{{view="test",le="{le}"}}')
+            for le in ('0', '2', '5', '100', '+Inf')
+        ]
+        self.assertEqual(counts, [1, 1, 3, 3, 4])
+        self.assertEqual(sample(text, 'yatube_db_queries_sum{view="test"}'),
+                         1006)
+
+    def test_processes_are_summed(self):
+        """Счётчики других процессов складываются с текущим."""
+        metrics.CACHE_HITS.inc(view='posts:index')
+        for _ in range(2):
+            process = multiprocessing.get_context('fork').Process(
+                target=count_hits)
+            process.start()
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+        self.assertEqual(
+            sample(self.scrape(),
+                   'yatube_cache_hits_total{view="posts:index"}'),
+            5,
+        )
+
+    def test_thumbnails_counted(self):
+        post = Post.objects.create(
+            text='Пост', author=self.author, image=uploaded_gif())
+        generate(post.image.name, card_variants())
+        generate(post.image.name, card_variants())
+        text = self.scrape()
+        total = sum(
+            sample(text, f'yatube_thumbnails_generated_total{{format="{f}"}}')
+            or 0 for f in ('JPEG', 'WEBP'))
+        self.assertEqual(total, len(card_variants()))
@@ -0,0 +1,74 @@
+import re
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import timing
+from posts.models import Post
+
+User = get_user_model()
+SERVER_TIMING = re.compile(
+    r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="(?P<sql>\d+) SQL", '
+    r'tpl;dur=(?P<template>[\d.]+), '
+    r'cache;desc="hit (?P<hits>\d+) miss (?P<misses>\d+)"$'
+)
+
+
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(text='Тестовый пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        timing.reset_stats()
+        self.guest_client = Client()
+
+    def server_timing(self, response):
+        match = SERVER_TIMING.match(response['Server-Timing'])
+        self.assertIsNotNone(match, response['Server-Timing'])
+        return {
+            name: float(value) for name, value in match.groupdict().items()}
+
+    def test_header_reports_request(self):
+        """Server-Timing содержит SQL, шаблоны и обращения к кэшу."""
+        url = reverse('posts:index')
+        first = self.server_timing(self.guest_client.get(url))
+        self.assertGreater(first['sql'], 0)
+        self.assertGreater(first['template'], 0)
+        self.assertGreater(first['misses'], 0)
+        second = self.server_timing(self.guest_client.get(url))
+        self.assertGreater(second['hits'], 0)
+
+    def test_stats_per_url_name(self):
+        """Сводка копится по имени URL."""
+        for _ in range(2):
+            self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('about:author'))
+        stats = timing.request_stats()
+        self.assertEqual(stats['posts:index']['requests'], 2)
+        self.assertEqual(stats['about:author']['requests'], 1)
+        self.assertGreater(stats['posts:index']['sql_count'], 0)
+
+    def test_stats_endpoint_for_staff_only(self):
+        """Сводку видит только персонал."""
+        url = reverse('core:request_stats')
+        self.guest_client.get(reverse('posts:index'))
+        for user in (None, self.author):
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            with self.subTest(user=user):
+                self.assertEqual(
+                    client.get(url).status_code, HTTPStatus.FOUND)
+        client = Client()
+        client.force_login(self.staff)
+        response = client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('posts:index', response.json()['views'])
@@ -0,0 +1,151 @@
+import threading
+import time
+
+from django.db import connection
+
+UNRESOLVED = '-'
+# Поля сводки по имени URL: запросов, суммарное и наибольшее время,
+# SQL-запросов и их время, время шаблонов, попадания и промахи кэша.
+FIELDS = (
+    'requests', 'total', 'max', 'sql_count', 'sql_time', 'template_time',
+    'cache_hits', 'cache_misses',
+)
+
+_local = threading.local()
+_lock = threading.Lock()
+_stats = {}
+
+
+class RequestTimings:
+    """Счётчики одного запроса; сама же — обёртка execute_wrapper.
+
+    queries и templates — кортежи (начало, длительность, ...) для
+    журнала медленных запросов: на каждый SQL и шаблон приходится одно
+    добавление в список, разбираются они только у сохраняемых запросов.
+    """
+    __slots__ = (
+        'started', 'sql_count', 'sql_time', 'template_time',
+        'template_depth', 'cache_hits', 'cache_misses', 'queries',
+        'templates',
+    )
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.templates = []
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.sql_time += duration
+            self.sql_count += 1
+            self.queries.append((start, duration, sql, params, many))
+
+    def header(self, total):
+        """Значение Server-Timing; длительности в миллисекундах."""
+        return (
+            f'total;dur={total * 1000:.1f}, '
+            f'db;dur={self.sql_time * 1000:.1f};'
+            f'desc="{self.sql_count} SQL", '
+            f'tpl;dur={self.template_time * 1000:.1f}, '
+            f'cache;desc="hit {self.cache_hits} miss {self.cache_misses}"'
+        )
+
+
+def current():
+    """Счётчики запроса, который обрабатывает этот поток, или None."""
+    return getattr(_local, 'timings', None)
+
+
+def record_cache(hits, misses):
+    """Вызывается бэкендом кэша после чтения ключей."""
+    timings = current()
+    if timings is not None:
+        timings.cache_hits += hits
+        timings.cache_misses += misses
+
+
+def record_request(view_name, total, timings):
+    with _lock:
+        stats = _stats.get(view_name)
+        if stats is None:
+            stats = _stats[view_name] = [0, 0.0, 0.0, 0, 0.0, 0.0, 0, 0]
+        stats[0] += 1
+        stats[1] += total
+        stats[2] = max(stats[2], total)
+        stats[3] += timings.sql_count
+        stats[4] += timings.sql_time
+        stats[5] += timings.template_time
+        stats[6] += timings.cache_hits
+        stats[7] += timings.cache_misses
+
+
+def request_stats():
+    """Сводка по именам URL с начала работы процесса.
+
+    Время в миллисекундах: среднее на запрос и наибольшее; SQL-запросы
+    и обращения к кэшу — в среднем на запрос.
+    """
+    with _lock:
+        snapshot = {name: list(stats) for name, stats in _stats.items()}
+    report = {}
+    for name, stats in sorted(
+            snapshot.items(), key=lambda item: -item[1][1]):
+        values = dict(zip(FIELDS, stats))
+        requests = values['requests']
+        report[name] = {
+            'requests': requests,
+            'total_ms': round(values['total'] * 1000 / requests, 2),
+            'max_ms': round(values['max'] * 1000, 2),
+            'sql_count': round(values['sql_count'] / requests, 2),
+            'sql_ms': round(values['sql_time'] * 1000 / requests, 2),
+            'template_ms': round(
+                values['template_time'] * 1000 / requests, 2),
+            'cache_hits': round(values['cache_hits'] / requests, 2),
+            'cache_misses': round(values['cache_misses'] / requests, 2),
+        }
+    return report
+
+
+def reset_stats():
+    with _lock:
+        _stats.clear()
+
+
+class ServerTimingMiddleware:
+    """Время запроса, SQL, шаблонов и обращения к кэшу.
+
+    Отдаёт их в заголовке Server-Timing и копит сводку по имени URL
+    (request_stats). Время шаблонов считает бэкенд
+    core.template_backends.timed, обращения к кэшу — SQLiteCache.
+    Счётчики остаются в request.server_timings. Ставится в начало
+    MIDDLEWARE, чтобы total включал все остальные.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        request.server_timings = timings
+        _local.timings = timings
+        try:
+            with connection.execute_wrapper(timings):
+                response = self.get_response(request)
+        finally:
+            _local.timings = None
+        total = time.perf_counter() - timings.started
+        response['Server-Timing'] = timings.header(total)
+        match = request.resolver_match
+        record_request(
+            match.view_name if match else UNRESOLVED, total, timings)
+        return response
@@ -1,6 +1,12 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import DatabaseError, connection
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
 from http import HTTPStatus
 
+from core import metrics, timing
+from core.database import pragma
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path},
@@ -17,3 +23,29 @@ def permission_denied(request, reason=''):
 
 def server_error(request):
     return render(request, 'core/500.html', status=HTTPStatus.NO_CONTENT)
+
+
+@staff_member_required
+def request_stats(request):
+    """Сводка ServerTimingMiddleware по именам URL для этого процесса."""
+    return JsonResponse({'views': timing.request_stats()})
+
+
+def metrics_view(request):
+    """Метрики Prometheus, сложенные по всем процессам сервера."""
+    return HttpResponse(
+        metrics.exposition(), content_type=metrics.CONTENT_TYPE)
+
+
+def health_check(request):
+    """Проверка для балансировщика: база отвечает и пишет журнал WAL."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        journal_mode = pragma(connection, 'journal_mode')
+    except DatabaseError as error:
+        return JsonResponse(
+            {'status': 'error', 'database': str(error)},
+            status=HTTPStatus.SERVICE_UNAVAILABLE,
+        )
+    return JsonResponse({'status': 'ok', 'journal_mode': journal_mode})
@@ -4,6 +4,11 @@ import sys
 
 
 def main():
+    # Тесты идут со своими настройками, а рабочие настройки не зависят
+    # от того, запущены ли тесты.
+    if sys.argv[1:2] == ['test']:
+        os.environ.setdefault(
+            'DJANGO_SETTINGS_MODULE', 'yatube.test_settings')
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
     try:
         from django.core.management import execute_from_command_line
@@ -1,6 +1,74 @@
-from django.contrib import admin
+from datetime import date, datetime, timedelta
 
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.core.exceptions import ValidationError
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from posts import bulk
 from posts.models import Group, Post, Comment, Follow
+from posts.paginators import EstimatedCountPaginator
+from posts.search import match_query, matching_ids
+
+
+def _period_start(day, kind):
+    if kind == 'year':
+        return date(day.year, 1, 1)
+    if kind == 'month':
+        return date(day.year, day.month, 1)
+    return day
+
+
+def _next_period(start, kind):
+    if kind == 'year':
+        return start.replace(year=start.year + 1)
+    if kind == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+class IndexedDatesQuerySet(QuerySet):
+    """dates() скачками по индексу вместо DISTINCT по всем строкам.
+
+    date_hierarchy в админке строит список лет, месяцев или дней через
+    dates(). Здесь каждый следующий период ищется одним запросом
+    «первая запись не раньше начала периода»: запросов столько,
+    сколько периодов, и каждый — один шаг по индексу.
+    """
+
+    def dates(self, field_name, kind, order='ASC'):
+        if kind not in ('year', 'month', 'day'):
+            return super().dates(field_name, kind, order)
+        ascending = self.order_by(field_name).values_list(
+            field_name, flat=True)
+        periods = []
+        value = ascending.first()
+        while value is not None:
+            if isinstance(value, datetime):
+                value = timezone.localtime(value).date()
+            start = _period_start(value, kind)
+            periods.append(start)
+            boundary = datetime.combine(
+                _next_period(start, kind), datetime.min.time())
+            if settings.USE_TZ:
+                boundary = timezone.make_aware(boundary)
+            value = ascending.filter(
+                **{f'{field_name}__gte': boundary}).first()
+        return periods if order == 'ASC' else periods[::-1]
+
+
+class PostActionForm(ActionForm):
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        required=False,
+        label='Группа',
+        empty_label='без группы',
+    )
+    confirm = forms.BooleanField(
+        required=False, label='подтверждаю удаление')
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -10,13 +78,71 @@ class PostAdmin(admin.ModelAdmin):
                     'author',
                     'group',
                     )
-    list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    raw_id_fields = ('author',)
+    autocomplete_fields = ('group',)
     search_fields = ('text',)
+    # Оба фильтра по дате превращаются в диапазон по индексу pub_date.
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
     empty_value_display = '-пусто-'
+    # Число строк оценивается, полный COUNT(*) не нужен ни для
+    # страницы, ни для «показать все».
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    action_form = PostActionForm
+    actions = ('move_to_group', 'delete_posts')
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return IndexedDatesQuerySet(
+            queryset.model, query=queryset.query, using=queryset.db)
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        # Стандартное удаление загружает и удаляет посты по одному.
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по тексту через FTS5 вместо LIKE по всей таблице."""
+        if not match_query(search_term):
+            return queryset, False
+        return queryset.filter(pk__in=matching_ids(search_term)), False
+
+    def move_to_group(self, request, queryset):
+        field = self.action_form.base_fields['group']
+        try:
+            group = field.clean(request.POST.get('group'))
+        except ValidationError:
+            self.message_user(
+                request, 'Выберите существующую группу.', messages.ERROR)
+            return
+        bulk.move_posts(queryset, group)
+        self.message_user(
+            request, f'Посты перенесены: {group or "без группы"}.')
+    move_to_group.short_description = 'Перенести в выбранную группу'
+    move_to_group.allowed_permissions = ('change',)
+
+    def delete_posts(self, request, queryset):
+        if request.POST.get('confirm') != 'on':
+            self.message_user(
+                request,
+                'Отметьте «подтверждаю удаление», чтобы удалить посты.',
+                messages.WARNING,
+            )
+            return
+        deleted = bulk.delete_posts(queryset)
+        self.message_user(request, f'Удалено постов: {deleted}.')
+    delete_posts.short_description = 'Удалить выбранные посты'
+    delete_posts.allowed_permissions = ('delete',)
+
+
+class GroupAdmin(admin.ModelAdmin):
+    search_fields = ('title', 'slug')
 
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment)
 admin.site.register(Follow)
@@ -0,0 +1,214 @@
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Group, User
+
+LIMIT = 10
+# Журнал изменений общий для всех процессов: каждый процесс
+# догоняет его перед поиском и правит свой индекс на месте.
+JOURNAL_KEY = 'autocomplete-journal'
+CHANGE_KEY = 'autocomplete-change:{}'
+CHANGE_TIMEOUT = 60 * 60 * 24
+# Отставание, после которого индекс проще собрать заново, чем читать
+# журнал: так бывает и после того, как счётчик вытеснили из кэша.
+CATCH_UP_LIMIT = 1000
+
+USERS = 'users'
+GROUPS = 'groups'
+
+
+class PrefixIndex:
+    """Отсортированный массив ключей: поиск по префиксу через bisect.
+
+    Ключи, id и подписи лежат в параллельных массивах, id — в array,
+    чтобы миллион записей не превращался в миллион объектов int.
+    """
+
+    def __init__(self, items=()):
+        rows = sorted(items)
+        self.keys = [key for key, _, _ in rows]
+        self.pks = array('q', (pk for _, pk, _ in rows))
+        # Если подпись совпадает с ключом, хранится одна строка.
+        self.labels = [
+            key if label == key else label for key, _, label in rows]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _find(self, key, pk):
+        index = bisect_left(self.keys, key)
+        while index < len(self.keys) and self.keys[index] == key:
+            if self.pks[index] == pk:
+                return index
+            index += 1
+        return None
+
+    def add(self, key, pk, label):
+        if self._find(key, pk) is not None:
+            return
+        index = bisect_right(self.keys, key)
+        self.keys.insert(index, key)
+        self.pks.insert(index, pk)
+        self.labels.insert(index, key if label == key else label)
+
+    def remove(self, key, pk):
+        index = self._find(key, pk)
+        if index is not None:
+            del self.keys[index], self.pks[index], self.labels[index]
+
+    def search(self, prefix, limit=LIMIT):
+        """Подписи до limit разных записей, ключ которых начинается
+        с prefix, в порядке ключей."""
+        found = {}
+        index = bisect_left(self.keys, prefix)
+        while index < len(self.keys) and len(found) < limit:
+            if not self.keys[index].startswith(prefix):
+                break
+            found.setdefault(self.pks[index], self.labels[index])
+            index += 1
+        return list(found.values())
+
+    def footprint(self):
+        """Память под индекс в байтах по частям; общие объекты
+        считаются один раз."""
+        seen = set()
+
+        def size(value):
+            if id(value) in seen:
+                return 0
+            seen.add(id(value))
+            total = sys.getsizeof(value)
+            if isinstance(value, (list, tuple)):
+                total += sum(size(item) for item in value)
+            return total
+
+        return {
+            'keys': size(self.keys),
+            'pks': size(self.pks),
+            'labels': size(self.labels),
+        }
+
+
+def user_keys(username):
+    return (username.lower(),) if username else ()
+
+
+def group_keys(title, slug):
+    return tuple({title.lower(), slug.lower()}) if slug else ()
+
+
+def _group_items(groups):
+    for pk, title, slug in groups:
+        label = (title, slug)
+        for key in group_keys(title, slug):
+            yield key, pk, label
+
+
+class Autocomplete:
+    """Индексы имён пользователей и групп текущего процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.indexes = None
+        self.position = 0
+
+    def _build(self):
+        # Позиция журнала запоминается до чтения базы: изменения,
+        # попавшие в выборку, применятся ещё раз, это безопасно.
+        self.position = cache.get(JOURNAL_KEY, 0)
+        users = User.objects.order_by().values_list('pk', 'username')
+        groups = Group.objects.order_by().values_list('pk', 'title', 'slug')
+        self.indexes = {
+            USERS: PrefixIndex(
+                (key, pk, username)
+                for pk, username in users.iterator()
+                for key in user_keys(username)
+            ),
+            GROUPS: PrefixIndex(_group_items(groups.iterator())),
+        }
+
+    def _sync(self):
+        if self.indexes is None:
+            self._build()
+            return
+        position = cache.get(JOURNAL_KEY, 0)
+        if position == self.position:
+            return
+        if not 0 < position - self.position <= CATCH_UP_LIMIT:
+            self._build()
+            return
+        numbers = range(self.position + 1, position + 1)
+        changes = cache.get_many([CHANGE_KEY.format(n) for n in numbers])
+        if len(changes) != len(numbers):
+            # Запись вытеснена или ещё не дописана: индекс собирается
+            # заново, чтобы не пропустить изменение.
+            self._build()
+            return
+        for number in numbers:
+            self._apply(*changes[CHANGE_KEY.format(number)])
+        self.position = position
+
+    def _apply(self, kind, pk, old_keys, new_keys, label):
+        index = self.indexes[kind]
+        for key in set(old_keys) | set(new_keys):
+            index.remove(key, pk)
+        for key in new_keys:
+            index.add(key, pk, label)
+
+    def search(self, prefix, kinds=(USERS, GROUPS), limit=LIMIT):
+        prefix = prefix.strip().lower()
+        with self.lock:
+            self._sync()
+            if not prefix:
+                return {kind: [] for kind in kinds}
+            return {
+                kind: self.indexes[kind].search(prefix, limit)
+                for kind in kinds
+            }
+
+    def footprint(self):
+        """{вид: (записей, память по частям)} для отчёта."""
+        with self.lock:
+            self._sync()
+            return {
+                kind: (len(index), index.footprint())
+                for kind, index in self.indexes.items()
+            }
+
+
+autocomplete = Autocomplete()
+
+
+def _next_number():
+    # Если счётчик вытеснят из кэша, отсчёт начнётся с нового значения,
+    # как у версий лент: номера не повторят записи, которые процессы уже
+    # применили, и те соберут индексы заново.
+    number = int(time.time() * 1000)
+    if not cache.add(JOURNAL_KEY, number, None):
+        try:
+            number = cache.incr(JOURNAL_KEY)
+        except ValueError:
+            cache.set(JOURNAL_KEY, number, None)
+    return number
+
+
+def _publish(change):
+    cache.set(CHANGE_KEY.format(_next_number()), change, CHANGE_TIMEOUT)
+
+
+def invalidate():
+    """Оставляет в журнале пропуск, и все процессы собирают индексы
+    заново. Нужно после массовой вставки в обход сигналов."""
+    _next_number()
+
+
+def record_change(kind, pk, old_keys, new_keys, label):
+    """Публикует изменение в журнал после коммита транзакции."""
+    change = (kind, pk, tuple(old_keys), tuple(new_keys), label)
+    transaction.on_commit(lambda: _publish(change))
@@ -0,0 +1,38 @@
+from django.db import transaction
+from django.db.models import Count
+
+from . import cache, counters, storage
+from .models import Comment, Post, TimelineEntry
+
+
+def move_posts(posts, group):
+    """Переносит посты в группу (или убирает из групп) одним UPDATE."""
+    with transaction.atomic():
+        cache.touch_posts(posts, group=group)
+
+
+def delete_posts(posts):
+    """Удаляет посты без загрузки в память и сигналов на каждую строку.
+
+    Зависимые строки удаляются по одному DELETE на таблицу, счётчики
+    авторов сдвигаются по одному UPDATE на автора, картинки без других
+    ссылок удаляются после коммита. Возвращает число удалённых постов.
+    """
+    posts = posts.order_by()
+    with transaction.atomic():
+        ids = posts.values('pk')
+        per_author = list(
+            posts.values_list('author_id').annotate(total=Count('pk')))
+        images = list(
+            posts.exclude(image='').values_list('image', flat=True)
+            .distinct())
+        feeds = cache.affected_feeds(posts)
+        Comment.objects.filter(post_id__in=ids)._raw_delete(posts.db)
+        TimelineEntry.objects.filter(post_id__in=ids)._raw_delete(posts.db)
+        deleted = Post.objects.filter(pk__in=ids)._raw_delete(posts.db)
+        for author_id, total in per_author:
+            counters.shift_user(author_id, posts_count=-total)
+        for name in images:
+            storage.release(name)
+        cache.bump_feeds(*feeds)
+    return deleted
@@ -0,0 +1,224 @@
+import hashlib
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from . import thumbnails as post_thumbnails
+
+CARD_TEMPLATE = 'includes/post_card.html'
+PAGE_KEY = 'anonymous-page:{}'
+PAGE_LOCK_KEY = 'anonymous-page-lock:{}'
+PAGE_WAIT_STEP = 0.05
+
+# hit — свежая копия, stale — устаревшая копия, пока страницу
+# пересобирает другой запрос, waited — копия, дождавшаяся пересборки,
+# miss — страница отрисована этим запросом.
+PAGE_CACHE_STATS = Counter()
+
+FEED_VERSION_KEY = 'feed-version:{}'
+
+
+def _initial_version():
+    # Если ключ версии вытеснят из кэша, отсчёт начнётся с нового
+    # значения и старые фрагменты не совпадут с ним случайно.
+    return int(time.time() * 1000)
+
+
+def feed_name(kind, pk=None):
+    return kind if pk is None else f'{kind}:{pk}'
+
+
+def feed_version(name):
+    """Текущая версия ленты для ключа фрагментного кэша."""
+    key = FEED_VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_feeds(*names):
+    """Сдвигает версии лент, чтобы их страницы отрисовались заново.
+
+    Внутри транзакции версии сдвигаются ещё раз после коммита: иначе
+    запрос, прочитавший новую версию до коммита, сохранил бы под ней
+    старые данные.
+    """
+    _bump(set(names))
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _bump(set(names)))
+
+
+def _bump(names):
+    for name in names:
+        key = FEED_VERSION_KEY.format(name)
+        if not cache.add(key, _initial_version(), None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, _initial_version(), None)
+
+
+def post_feeds(post, *group_ids):
+    """Ленты, в которых показывается пост."""
+    names = [feed_name('index'), feed_name('profile', post.author_id)]
+    for group_id in {post.group_id, *group_ids}:
+        if group_id is not None:
+            names.append(feed_name('group', group_id))
+    return names
+
+
+def affected_feeds(posts):
+    """Ленты, в которых показываются посты из queryset.
+
+    Читаются только разные пары (автор, группа), а не сами посты.
+    """
+    feeds = {feed_name('index')}
+    pairs = posts.order_by().values_list('author_id', 'group_id').distinct()
+    for author_id, group_id in pairs:
+        feeds.add(feed_name('profile', author_id))
+        if group_id is not None:
+            feeds.add(feed_name('group', group_id))
+    return feeds
+
+
+def touch_posts(posts, **changes):
+    """Обновляет посты одним UPDATE и сдвигает edited и версии их лент.
+
+    Так карточки и страницы с этими постами отрисуются заново. Если
+    посты переносятся в группу, сдвигается и лента этой группы.
+    """
+    feeds = affected_feeds(posts)
+    group = changes.get('group')
+    if group is not None:
+        feeds.add(feed_name('group', getattr(group, 'pk', group)))
+    posts.update(edited=timezone.now(), **changes)
+    bump_feeds(*feeds)
+
+
+def card_key(post, show_author, show_group):
+    """Ключ карточки: id поста, его версия и всё, что показано рядом."""
+    author = post.author
+    group_slug = post.group.slug if post.group_id else ''
+    source = (
+        f'{post.pk}:{post.edited.timestamp()}:{int(show_author)}'
+        f':{int(show_group)}:{group_slug}:{author.username}'
+        f':{author.get_full_name()}'
+    )
+    return 'post-card:' + hashlib.md5(source.encode()).hexdigest()
+
+
+def render_cards(posts, show_author=True, show_group=True):
+    """Карточки постов страницы одним get_many; рисуются только промахи.
+
+    Миниатюры для промахов читаются из kvstore одним пакетом.
+    """
+    posts = list(posts)
+    keys = [card_key(post, show_author, show_group) for post in posts]
+    cards = cache.get_many(keys)
+    to_render = [
+        (key, post) for key, post in zip(keys, posts) if key not in cards]
+    thumbnails = post_thumbnails.resolve_thumbnails(
+        [post for _, post in to_render])
+    missing = {}
+    for key, post in to_render:
+        missing[key] = render_to_string(CARD_TEMPLATE, {
+            'post': post,
+            'thumbnail': thumbnails.get(post.pk),
+            'show_author': show_author,
+            'show_group': show_group,
+        })
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
+
+
+def page_cache_stats():
+    return dict(PAGE_CACHE_STATS)
+
+
+def _restore_page(entry):
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for header, value in entry['headers']:
+        response[header] = value
+    return response
+
+
+def _store_page(key, version, response):
+    if response.status_code != 200 or response.cookies or (
+            response.streaming):
+        return
+    cache.set(key, {
+        'version': version,
+        'fresh_until': time.time() + settings.PAGE_CACHE_FRESH,
+        'status': response.status_code,
+        'content': response.content,
+        'headers': list(response.items()),
+    }, settings.PAGE_CACHE_TIMEOUT)
+
+
+def _wait_for_page(key, version):
+    deadline = time.time() + settings.PAGE_CACHE_WAIT
+    while time.time() < deadline:
+        time.sleep(PAGE_WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None and entry['version'] == version:
+            return entry
+    return None
+
+
+def anonymous_page_cache(view):
+    """Кэш целой страницы для гостей с пересборкой в один поток.
+
+    Копия привязана к отпечатку страницы из conditional_page
+    (request.page_etag). Устаревшую копию пересобирает только запрос,
+    взявший блокировку; остальные получают старую копию, а если её нет —
+    ждут пересборки не дольше PAGE_CACHE_WAIT секунд.
+    """
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or (
+                request.user.is_authenticated):
+            return view(request, *args, **kwargs)
+        path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        key = PAGE_KEY.format(path_hash)
+        version = getattr(request, 'page_etag', None)
+        entry = cache.get(key)
+        if entry is not None and entry['version'] == version and (
+                time.time() < entry['fresh_until']):
+            PAGE_CACHE_STATS['hit'] += 1
+            return _restore_page(entry)
+        lock_key = PAGE_LOCK_KEY.format(path_hash)
+        if cache.add(lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+            try:
+                PAGE_CACHE_STATS['miss'] += 1
+                response = view(request, *args, **kwargs)
+                _store_page(key, version, response)
+            finally:
+                cache.delete(lock_key)
+            return response
+        if entry is not None:
+            PAGE_CACHE_STATS['stale'] += 1
+            # Старая копия уходит со своим ETag: с новым клиент получал
+            # бы 304 на устаревшую страницу и после пересборки.
+            response = _restore_page(entry)
+            if entry['version'] is not None:
+                response['ETag'] = entry['version']
+            return response
+        entry = _wait_for_page(key, version)
+        if entry is not None:
+            PAGE_CACHE_STATS['waited'] += 1
+            return _restore_page(entry)
+        PAGE_CACHE_STATS['miss'] += 1
+        return view(request, *args, **kwargs)
+    return inner
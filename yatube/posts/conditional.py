@@ -0,0 +1,160 @@
+import hashlib
+from functools import wraps
+
+from django.db.models import Exists, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response
+
+from .cache import feed_name, feed_version
+from .models import Comment, Follow, Group, Post, TimelineEntry, User
+
+
+def make_etag(request, fingerprint):
+    """Слабый ETag из отпечатка данных, параметров запроса и пользователя.
+
+    Страницы вошедшего пользователя содержат формы с CSRF-токеном, а
+    после нового входа токен другой, поэтому он тоже входит в ETag.
+    У гостей форм нет, и их ETag общий для кэша страниц.
+    """
+    user_id = csrf_token = None
+    if request.user.is_authenticated:
+        user_id = request.user.pk
+        csrf_token = request.META.get('CSRF_COOKIE')
+    source = repr((
+        request.path,
+        sorted(request.GET.lists()),
+        user_id,
+        csrf_token,
+        fingerprint,
+    ))
+    return 'W/"{}"'.format(hashlib.md5(source.encode()).hexdigest())
+
+
+def conditional_page(state_func):
+    """Отвечает 304, пока отпечаток страницы не изменился.
+
+    state_func получает аргументы представления и одним запросом
+    возвращает отпечаток или None, если объекта нет, — тогда ответ
+    строит само представление. Посчитанный ETag сохраняется в
+    request.page_etag для кэша страниц.
+
+    Last-Modified не отдаётся: отпечаток учитывает удаления, подписки
+    и счётчики, а время последней правки от них не меняется, и клиент
+    с одним If-Modified-Since получал бы 304 на изменившуюся страницу.
+    """
+    def decorator(view):
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            fingerprint = state_func(request, *args, **kwargs)
+            if fingerprint is None:
+                return view(request, *args, **kwargs)
+            etag = make_etag(request, fingerprint)
+            request.page_etag = etag
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            # Устаревшая копия из кэша страниц уже несёт свой ETag.
+            if response.status_code == 200 and not response.has_header(
+                    'ETag'):
+                response['ETag'] = etag
+            return response
+        return inner
+    return decorator
+
+
+def _first(queryset):
+    # Не .first(): он добавляет ORDER BY pk, и SQLite сортирует
+    # единственную строку во временном B-дереве.
+    return next(iter(queryset[:1]), None)
+
+
+def _last_edited(**lookup):
+    """Подзапрос: время последней правки постов по индексу *_edited_idx."""
+    return Subquery(
+        Post.objects.filter(**lookup).order_by('-edited')
+        .values('edited')[:1]
+    )
+
+
+def index_state(request):
+    # Вместо COUNT по всей таблице — версия ленты: её сдвигает
+    # каждое создание, правка и удаление поста.
+    state = Post.objects.aggregate(last=Max('edited'))
+    state['version'] = feed_version(feed_name('index'))
+    return state
+
+
+def group_state(request, slug):
+    state = _first(
+        Group.objects.filter(slug=slug)
+        .annotate(last=_last_edited(group=OuterRef('pk')))
+        .values('pk', 'title', 'description', 'last')
+    )
+    if state is None:
+        return None
+    state['version'] = feed_version(feed_name('group', state['pk']))
+    return state
+
+
+def profile_state(request, username):
+    authors = User.objects.filter(username=username).annotate(
+        last=_last_edited(author=OuterRef('pk')))
+    fields = [
+        'pk', 'first_name', 'last_name', 'counters__posts_count',
+        'counters__followers_count', 'counters__following_count', 'last',
+    ]
+    if request.user.is_authenticated:
+        authors = authors.annotate(is_following=Exists(Follow.objects.filter(
+            author=OuterRef('pk'), user=request.user)))
+        fields.append('is_following')
+    state = _first(authors.values(*fields))
+    if state is None:
+        return None
+    state['version'] = feed_version(feed_name('profile', state['pk']))
+    return state
+
+
+def post_state(request, post_id):
+    last_comment = Subquery(
+        Comment.objects.filter(post=OuterRef('pk')).order_by('-created')
+        .values('created')[:1]
+    )
+    state = _first(
+        Post.objects.filter(pk=post_id)
+        .annotate(last_comment=last_comment)
+        .values(
+            'edited', 'comments_count', 'group__title', 'group__slug',
+            'author__username', 'author__first_name', 'author__last_name',
+            'author__counters__posts_count', 'last_comment',
+        )
+    )
+    return state
+
+
+def follow_state(request):
+    # Не агрегат по Follow ⋈ Post: он читает все посты всех авторов из
+    # подписок. Голова ленты — один шаг по индексу TimelineEntry (user,
+    # pub_date), популярные авторы — по шагу индекса post_author_edited_idx.
+    # Правки и удаления постов сдвигают версию общей ленты.
+    timeline = TimelineEntry.objects.filter(
+        user=OuterRef('pk')).order_by('-pub_date', '-post_id')
+    follows = Follow.objects.filter(user=OuterRef('pk')).order_by('-pk')
+    state = _first(
+        User.objects.filter(pk=request.user.pk).annotate(
+            head_date=Subquery(timeline.values('pub_date')[:1]),
+            head_post=Subquery(timeline.values('post_id')[:1]),
+            last_follow=Subquery(follows.values('pk')[:1]),
+        ).values(
+            'head_date', 'head_post', 'last_follow',
+            'counters__following_count',
+        )
+    )
+    state['popular'] = sorted(
+        Follow.objects.filter(
+            user=request.user, author__popularity__isnull=False)
+        .annotate(last=_last_edited(author=OuterRef('author_id')))
+        .order_by().values_list('author_id', 'last')
+    )
+    state['version'] = feed_version(feed_name('index'))
+    return state
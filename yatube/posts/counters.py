@@ -0,0 +1,104 @@
+from django.db import transaction
+from django.db.models import (
+    Count, F, IntegerField, OuterRef, Subquery, Value,
+)
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserCounters
+
+BATCH_SIZE = 1000
+
+# Поле счётчика -> (модель, поле, по которому считается, пользователь/пост).
+USER_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def shift_user(user_id, **deltas):
+    """Сдвигает счётчики пользователя одним UPDATE.
+
+    При увеличении недостающая строка счётчиков создаётся; уменьшение
+    без строки пропускается — так бывает, когда пользователь удаляется
+    вместе со своими постами и подписками.
+    """
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    updated = UserCounters.objects.filter(user_id=user_id).update(**changes)
+    if not updated and any(delta > 0 for delta in deltas.values()):
+        UserCounters.objects.get_or_create(user_id=user_id)
+        UserCounters.objects.filter(user_id=user_id).update(**changes)
+
+
+def shift_post(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta)
+
+
+def _total(model, field):
+    totals = (
+        model.objects.filter(**{field: OuterRef('pk')}).order_by()
+        .values(field).annotate(total=Count('pk')).values('total')
+    )
+    return Coalesce(
+        Subquery(totals, output_field=IntegerField()), Value(0))
+
+
+def _batches(queryset, batch_size):
+    last_pk = 0
+    while True:
+        pks = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return
+        last_pk = pks[-1]
+        yield pks
+
+
+def reconcile_users(batch_size=BATCH_SIZE):
+    """Пересчитывает счётчики пользователей, возвращает число исправленных."""
+    repaired = 0
+    annotations = {
+        field: _total(model, lookup)
+        for field, (model, lookup) in USER_COUNTERS.items()
+    }
+    for pks in _batches(User.objects.all(), batch_size):
+        with transaction.atomic():
+            actual = (
+                User.objects.filter(pk__in=pks).annotate(**annotations)
+                .values('pk', *annotations)
+            )
+            stored = UserCounters.objects.in_bulk(pks, field_name='user_id')
+            missing = []
+            for row in actual:
+                user_id = row.pop('pk')
+                counters = stored.get(user_id)
+                if counters is None:
+                    missing.append(UserCounters(user_id=user_id, **row))
+                elif any(getattr(counters, field) != value
+                         for field, value in row.items()):
+                    UserCounters.objects.filter(pk=counters.pk).update(**row)
+                    repaired += 1
+            UserCounters.objects.bulk_create(missing)
+        repaired += len(missing)
+    return repaired
+
+
+def reconcile_posts(batch_size=BATCH_SIZE):
+    """Пересчитывает comments_count постов, возвращает число исправленных."""
+    repaired = 0
+    for pks in _batches(Post.objects.all(), batch_size):
+        with transaction.atomic():
+            rows = (
+                Post.objects.filter(pk__in=pks)
+                .annotate(actual=_total(Comment, 'post'))
+                .values_list('pk', 'comments_count', 'actual')
+            )
+            for post_id, stored, actual in rows:
+                if stored != actual:
+                    Post.objects.filter(pk=post_id).update(
+                        comments_count=actual)
+                    repaired += 1
+    return repaired
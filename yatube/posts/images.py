@@ -0,0 +1,94 @@
+import base64
+import logging
+from io import BytesIO
+
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+BACKFILL_FIELDS = (
+    'image_width', 'image_height', 'image_placeholder', 'edited')
+
+# Сторона LQIP в пикселях: data URI выходит в несколько сотен байт.
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_QUALITY = 40
+# Значения EXIF Orientation, при которых картинка поворачивается на 90°.
+ROTATED = (5, 6, 7, 8)
+
+
+def image_metadata(file_):
+    """Ширина, высота и LQIP картинки.
+
+    LQIP — data URI JPEG-копии не больше PLACEHOLDER_SIZE пикселей,
+    которую браузер растягивает до размеров картинки, пока та грузится.
+    Размеры учитывают EXIF-поворот, как и миниатюры sorl.
+    """
+    file_.seek(0)
+    with Image.open(file_) as image:
+        width, height = image.size
+        if image.getexif().get(0x0112) in ROTATED:
+            width, height = height, width
+        image.draft('RGB', (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+        preview = ImageOps.exif_transpose(image).convert('RGBA')
+    file_.seek(0)
+    preview.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    background = Image.new('RGB', preview.size, 'white')
+    background.paste(preview, mask=preview.getchannel('A'))
+    buffer = BytesIO()
+    background.save(buffer, 'JPEG', quality=PLACEHOLDER_QUALITY)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return width, height, f'data:image/jpeg;base64,{encoded}'
+
+
+def describe(post):
+    """Заполняет размеры и LQIP поста; нечитаемую картинку пропускает."""
+    try:
+        (post.image_width, post.image_height,
+         post.image_placeholder) = image_metadata(post.image)
+    except (OSError, SyntaxError, ValueError):
+        logger.warning('Не удалось прочитать картинку %s', post.image.name)
+        return False
+    return True
+
+
+def _describe_stored(post):
+    try:
+        post.image.open('rb')
+    except OSError:
+        logger.warning('Нет файла картинки %s', post.image.name)
+        return False
+    try:
+        return describe(post)
+    finally:
+        post.image.close()
+
+
+def backfill(batch_size=BATCH_SIZE):
+    """Заполняет размеры и LQIP постов с картинкой, у которых их нет.
+
+    Посты читаются порциями по первичному ключу, каждая порция
+    сохраняется одним bulk_update. Возвращает (заполнено, ошибок).
+    """
+    posts = Post.objects.exclude(image='').filter(image_width__isnull=True)
+    filled = failed = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            posts.filter(pk__gt=last_pk).order_by('pk')
+            .only('pk', 'image')[:batch_size]
+        )
+        if not batch:
+            return filled, failed
+        last_pk = batch[-1].pk
+        described = []
+        for post in batch:
+            if _describe_stored(post):
+                post.edited = timezone.now()
+                described.append(post)
+        Post.objects.bulk_update(described, BACKFILL_FIELDS)
+        filled += len(described)
+        failed += len(batch) - len(described)
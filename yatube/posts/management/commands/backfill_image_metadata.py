@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import images
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры и размытую заглушку картинок постов, '
+        'загруженных до появления этих полей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=images.BATCH_SIZE,
+            help='Сколько постов читать и сохранять за раз.',
+        )
+
+    def handle(self, *args, **options):
+        filled, failed = images.backfill(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Заполнено постов: {filled}, не удалось прочитать: {failed}'))
@@ -0,0 +1,61 @@
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import median, percentile
+from posts.autocomplete import PrefixIndex, autocomplete
+
+ALPHABET = string.ascii_lowercase + string.digits + '_'
+MB = 1024 * 1024
+
+
+def username(rng):
+    return ''.join(rng.choices(ALPHABET, k=rng.randint(5, 15)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит индекс автодополнения по синтетическим именам, замеряет '
+        'время поиска по префиксу и печатает, сколько памяти он занимает. '
+        'С --live печатает память индекса по текущей базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000000)
+        parser.add_argument('--lookups', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--live', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['live']:
+            for kind, (entries, parts) in autocomplete.footprint().items():
+                self.report(kind, entries, parts)
+            return
+        rng = random.Random(options['seed'])
+        names = [username(rng) for _ in range(options['users'])]
+        start = time.perf_counter()
+        index = PrefixIndex(
+            (name, pk, name) for pk, name in enumerate(names, start=1))
+        self.stdout.write(
+            f'Построение: {time.perf_counter() - start:.2f} с')
+        self.report('users', len(index), index.footprint())
+        samples = []
+        for _ in range(options['lookups']):
+            name = rng.choice(names)
+            prefix = name[:rng.randint(1, 4)]
+            start = time.perf_counter()
+            index.search(prefix)
+            samples.append((time.perf_counter() - start) * 1000000)
+        self.stdout.write(
+            f'Поиск по префиксу, мкс: медиана {median(samples):.1f}, '
+            f'p99 {percentile(samples, 0.99):.1f}')
+
+    def report(self, kind, entries, parts):
+        total = sum(parts.values())
+        details = ', '.join(
+            f'{part} {size / MB:.1f}' for part, size in parts.items())
+        self.stdout.write(
+            f'{kind}: записей {entries}, {total / MB:.1f} МБ ({details}), '
+            f'{total / max(entries, 1):.0f} байт на запись')
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.test.utils import override_settings
+
+from core.benchmarks import benchmark_database, measure, median
+from posts.models import Post, User
+from posts.paginators import KeysetPaginator
+from posts.views import NUMBER_OF_POSTS
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время выборки страницы ленты при пагинации '
+        'через OFFSET и по курсору на разной глубине.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--pages', default='1,10,100,500,5000')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        pages = [int(page) for page in options['pages'].split(',')]
+        # Кэш тоже временный: создание пользователя пишет в журнал
+        # автодополнения, и без этого рабочий сайт подсказывал бы
+        # несуществующего автора.
+        directory = tempfile.mkdtemp()
+        try:
+            caches = {'default': {
+                'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+                'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+            }}
+            with benchmark_database(), override_settings(CACHES=caches):
+                self.seed(options['posts'])
+                self.run(pages, options['repeat'])
+        finally:
+            shutil.rmtree(directory)
+
+    def seed(self, total):
+        author = User.objects.create_user(username='bench-author')
+        for start in range(0, total, BATCH_SIZE):
+            Post.objects.bulk_create(
+                Post(text=f'Пост {number}', author=author)
+                for number in range(start, min(start + BATCH_SIZE, total))
+            )
+
+    def run(self, pages, repeat):
+        post_list = Post.objects.select_related('author', 'group')
+        offset_paginator = Paginator(post_list, NUMBER_OF_POSTS)
+        keyset_paginator = KeysetPaginator(post_list, NUMBER_OF_POSTS)
+        self.stdout.write(f'{"страница":>10} {"offset, мс":>12} '
+                          f'{"keyset, мс":>12}')
+        for page in pages:
+            if page > offset_paginator.num_pages:
+                continue
+            cursor = None
+            if page > 1:
+                last = post_list.order_by(*keyset_paginator.ordering)[
+                    (page - 1) * NUMBER_OF_POSTS - 1]
+                cursor = keyset_paginator.encode_cursor(last)
+
+            def offset_page():
+                list(offset_paginator.get_page(page))
+
+            def keyset_page():
+                list(keyset_paginator.get_page(after=cursor))
+
+            self.stdout.write(
+                f'{page:>10} {median(measure(offset_page, repeat)):>12.2f} '
+                f'{median(measure(keyset_page, repeat)):>12.2f}'
+            )
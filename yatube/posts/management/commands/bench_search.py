@@ -0,0 +1,92 @@
+import os
+import random
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core.benchmarks import benchmark_database, measure, median
+from posts.models import Post, User
+from posts.search import SearchPaginator, matching_ids
+from posts.views import NUMBER_OF_POSTS
+
+BATCH_SIZE = 5000
+VOCABULARY = 20000
+WORDS_PER_POST = 20
+# Ранги слов в частотном словаре: от встречающихся почти в каждом посте
+# до редких.
+TERM_RANKS = (0, 10, 100, 1000, 10000)
+
+
+def word(rank):
+    return f'слово{rank:05d}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск по постам через FTS5 и через LIKE: первая '
+        'страница результатов и число совпадений для слов разной частоты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        # Кэш тоже временный: создание пользователя пишет в журнал
+        # автодополнения, и без этого рабочий сайт подсказывал бы
+        # несуществующего автора.
+        directory = tempfile.mkdtemp()
+        try:
+            caches = {'default': {
+                'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+                'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+            }}
+            with benchmark_database(), override_settings(CACHES=caches):
+                self.seed(options['posts'], random.Random(options['seed']))
+                self.run(options['repeat'])
+        finally:
+            shutil.rmtree(directory)
+
+    def seed(self, total, rng):
+        # Частоты слов по закону Ципфа, как в живом тексте.
+        weights = [1 / (rank + 1) for rank in range(VOCABULARY)]
+        vocabulary = [word(rank) for rank in range(VOCABULARY)]
+        author = User.objects.create_user(username='bench-author')
+        for start in range(0, total, BATCH_SIZE):
+            Post.objects.bulk_create(
+                Post(
+                    text=' '.join(rng.choices(
+                        vocabulary, weights, k=WORDS_PER_POST)),
+                    author=author,
+                )
+                for _ in range(start, min(start + BATCH_SIZE, total))
+            )
+
+    def run(self, repeat):
+        self.stdout.write(
+            f'{"слово":>12} {"найдено":>9} {"fts стр., мс":>13} '
+            f'{"like стр., мс":>14} {"fts count, мс":>14} '
+            f'{"like count, мс":>15}'
+        )
+        for rank in TERM_RANKS:
+            term = word(rank)
+            like = Post.objects.filter(text__contains=term)
+            fts = Post.objects.filter(pk__in=matching_ids(term))
+            timings = [
+                median(measure(func, repeat)) for func in (
+                    lambda: SearchPaginator(
+                        term, NUMBER_OF_POSTS).get_page(),
+                    lambda: list(like[:NUMBER_OF_POSTS]),
+                    fts.count,
+                    like.count,
+                )
+            ]
+            self.stdout.write(
+                f'{term:>12} {like.count():>9} '
+                + ' '.join(
+                    f'{timing:>{width}.2f}'
+                    for timing, width in zip(timings, (13, 14, 14, 15)))
+            )
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+from sorl.thumbnail import default
+
+from core.benchmarks import benchmark_database, measure, median
+from posts.models import Post, User
+from posts.thumbnails import card_variants, generate, resolve_thumbnails
+from posts.views import NUMBER_OF_POSTS
+
+
+def make_image(number):
+    content = BytesIO()
+    Image.new('RGB', (1200, 800), (number * 20 % 256, 90, 160)).save(
+        content, 'JPEG')
+    return SimpleUploadedFile(f'bench-{number}.jpg', content.getvalue())
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает чтение вариантов картинок страницы ленты по одному '
+        '(как тег thumbnail) и одним пакетом: обращения к кэшу, запросы '
+        'и время.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        media_root = tempfile.mkdtemp()
+        try:
+            caches = {'default': {
+                'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+                'LOCATION': os.path.join(media_root, 'cache.sqlite3'),
+            }}
+            # Созданные миниатюры не попадают в метрики сайта.
+            with benchmark_database(), override_settings(
+                    MEDIA_ROOT=media_root, CACHES=caches, METRICS_DIR=None):
+                posts = self.seed()
+                self.run(posts, options['repeat'])
+        finally:
+            shutil.rmtree(media_root)
+
+    def seed(self):
+        author = User.objects.create_user(username='bench-author')
+        posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=author,
+                image=make_image(number))
+            for number in range(NUMBER_OF_POSTS)
+        ]
+        for post in posts:
+            generate(post.image.name, card_variants())
+        return list(Post.objects.select_related('author', 'group'))
+
+    def run(self, posts, repeat):
+        variants = card_variants()
+
+        def one_by_one():
+            for post in posts:
+                for geometry, options in variants:
+                    default.backend.get_ready(post.image, geometry, options)
+
+        def batched():
+            resolve_thumbnails(posts)
+
+        self.stdout.write(
+            f'{"способ":>12} {"кэш":>6} {"обращений":>10} '
+            f'{"запросов":>9} {"мс":>8}')
+        for name, func in (('по одной', one_by_one), ('пакетом', batched)):
+            for state in ('холодный', 'тёплый'):
+                calls, queries = self.round_trips(func, state)
+                samples = measure(
+                    lambda: self.prepare(state) or func(), repeat)
+                self.stdout.write(
+                    f'{name:>12} {state:>6} {calls:>10} {queries:>9} '
+                    f'{median(samples):>8.2f}')
+
+    def prepare(self, state):
+        if state == 'холодный':
+            cache.clear()
+
+    def round_trips(self, func, state):
+        """Обращения к кэшу kvstore (вложенные вызовы не считаются)
+        и запросы к БД за один вызов func.
+        """
+        self.prepare(state)
+        kvstore_cache = default.kvstore.cache
+        calls = []
+
+        def counted(method):
+            original = getattr(kvstore_cache, method)
+
+            def inner(*args, **kwargs):
+                calls.append(method)
+                with mock.patch.multiple(kvstore_cache, **originals):
+                    return original(*args, **kwargs)
+            return inner
+
+        originals = {
+            method: getattr(kvstore_cache, method)
+            for method in ('get', 'get_many', 'set', 'set_many')
+        }
+        with mock.patch.multiple(kvstore_cache, **{
+                method: counted(method) for method in originals}):
+            with CaptureQueriesContext(connection) as queries:
+                func()
+        return len(calls), len(queries)
@@ -0,0 +1,188 @@
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.benchmarks import benchmark_database, percentile
+from posts import seeding, urls
+from posts.models import Post
+from posts.query_plans import seeded_requests
+from posts.thumbnails import card_variants, generate
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет каждое представление posts через тестовый клиент: '
+        'p50/p95/p99 времени ответа, число SQL-запросов и выделенную '
+        'память. Отчёт в JSON, чтобы сравнивать прогоны разных коммитов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для отчёта; по умолчанию stdout.',
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым замером.',
+        )
+        parser.add_argument(
+            '--existing', action='store_true',
+            help='Мерить на текущей базе и кэше, а не на временных с '
+                 'seed_data; POST-запросы запишут в неё посты и '
+                 'комментарии. Не сочетается с --cold.',
+        )
+        parser.add_argument('--users', type=int, default=300)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=3000)
+        parser.add_argument('--comments', type=int, default=6000)
+        parser.add_argument('--follows', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['cold'] and options['existing']:
+            raise CommandError(
+                '--cold очищает кэш, а с --existing это общий кэш сайта.')
+        # Запросы замера не попадают в метрики и журнал медленных
+        # запросов сайта.
+        with override_settings(
+                DEBUG=False, METRICS_DIR=None, FLIGHT_RECORDER_SLOW_MS=None,
+                FLIGHT_RECORDER_SAMPLE_RATE=0):
+            if options['existing']:
+                report = self.run(None, options)
+            else:
+                report = self.run_seeded(options)
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(output)
+        else:
+            with open(options['output'], 'w') as file_:
+                file_.write(output + '\n')
+
+    def run_seeded(self, options):
+        media_root = tempfile.mkdtemp()
+        try:
+            caches = {'default': {
+                'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+                'LOCATION': os.path.join(media_root, 'cache.sqlite3'),
+            }}
+            with benchmark_database(), override_settings(
+                    MEDIA_ROOT=media_root, CACHES=caches):
+                dataset = seeding.seed(
+                    users=options['users'],
+                    groups=options['groups'],
+                    posts=options['posts'],
+                    comments=options['comments'],
+                    follows=options['follows'],
+                    seed=options['seed'],
+                )
+                # Миниатюры готовы заранее, как на рабочем сайте: пул
+                # не пишет в каталог, пока идут замеры.
+                for name in Post.objects.exclude(image='').values_list(
+                        'image', flat=True).distinct():
+                    generate(name, card_variants())
+                return self.run(dataset, options)
+        finally:
+            shutil.rmtree(media_root)
+
+    def requests(self):
+        requests = seeded_requests()
+        if requests is None:
+            raise CommandError(
+                'Нужны посты, группа и два пользователя: запустите seed_data.')
+        missing = {
+            f'{urls.app_name}:{pattern.name}' for pattern in urls.urlpatterns
+        } - {name for _, _, name, _, _ in requests}
+        if missing:
+            raise CommandError(
+                'Нет запросов для представлений: '
+                + ', '.join(sorted(missing)))
+        return requests
+
+    def run(self, dataset, options):
+        views = []
+        for user, method, name, kwargs, data in self.requests():
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            url = reverse(name, kwargs=kwargs)
+
+            def call():
+                return getattr(client, method)(url, data)
+
+            for _ in range(options['warmup']):
+                call()
+            samples = []
+            for _ in range(options['repeat']):
+                if options['cold']:
+                    cache.clear()
+                start = time.perf_counter()
+                call()
+                samples.append((time.perf_counter() - start) * 1000)
+            if options['cold']:
+                cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                status = call().status_code
+            views.append({
+                'view': name,
+                'method': method.upper(),
+                'user': 'guest' if user is None else 'user',
+                'path': url,
+                'status': status,
+                'p50_ms': round(percentile(samples, 0.5), 3),
+                'p95_ms': round(percentile(samples, 0.95), 3),
+                'p99_ms': round(percentile(samples, 0.99), 3),
+                'queries': len(queries),
+                'allocated_kib': round(
+                    self.allocated(call, options['cold']) / 1024, 1),
+            })
+        return {
+            'commit': current_commit(),
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'repeat': options['repeat'],
+            'cold': options['cold'],
+            'dataset': dataset,
+            'views': views,
+        }
+
+    @staticmethod
+    def allocated(call, cold):
+        """Пик памяти, выделенной за один запрос, в байтах."""
+        if cold:
+            cache.clear()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            call()
+            return tracemalloc.get_traced_memory()[1] - before
+        finally:
+            tracemalloc.stop()
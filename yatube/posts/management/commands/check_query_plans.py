@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core.benchmarks import benchmark_database
+from posts import seeding
+from posts.query_plans import collect, seeded_requests
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет запросы ко всем представлениям posts на заполненной '
+        'временной базе и проверяет EXPLAIN QUERY PLAN каждого SQL-запроса: '
+        'полный проход по таблице или сортировка во временном B-дереве — '
+        'ошибка.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        queries = self.run_seeded(options)
+        failed = [query for query in queries if query.problems]
+        for query in queries:
+            if query.problems or options['verbosity'] > 1:
+                self.stdout.write(f'{query.view}: {query.sql}')
+                for step in query.plan:
+                    self.stdout.write(f'    {step}')
+                for problem in query.problems:
+                    self.stdout.write(self.style.ERROR(f'  ! {problem}'))
+        if failed:
+            raise CommandError(
+                f'Планов с полным проходом или сортировкой: {len(failed)} '
+                f'из {len(queries)}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено запросов: {len(queries)}'))
+
+    def run_seeded(self, options):
+        # Кэш и медиа тоже временные: страницы заполненной базы не должны
+        # попасть в кэш сайта, а её запросы — в метрики и журнал
+        # медленных запросов.
+        media_root = tempfile.mkdtemp()
+        try:
+            caches = {'default': {
+                'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+                'LOCATION': os.path.join(media_root, 'cache.sqlite3'),
+            }}
+            with benchmark_database(), override_settings(
+                    MEDIA_ROOT=media_root, CACHES=caches, METRICS_DIR=None,
+                    FLIGHT_RECORDER_SLOW_MS=None,
+                    FLIGHT_RECORDER_SAMPLE_RATE=0):
+                seeding.seed(
+                    users=options['users'],
+                    groups=options['groups'],
+                    posts=options['posts'],
+                    comments=options['posts'],
+                    image_share=0,
+                    seed=options['seed'],
+                )
+                return collect(seeded_requests())
+        finally:
+            shutil.rmtree(media_root)
@@ -0,0 +1,79 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from sorl.thumbnail import default
+
+from posts.models import Post
+from posts.thumbnails import card_variants, generate
+
+CHUNK_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт недостающие варианты картинок уже опубликованных постов '
+        '(ширины POST_IMAGE_WIDTHS в форматах POST_IMAGE_FORMATS) '
+        'в несколько потоков.'
+    )
+
+    def add_arguments(self, parser):
+        # THUMBNAIL_WORKERS = 0 значит «без фонового пула», а команде
+        # нужен хотя бы один поток.
+        parser.add_argument(
+            '--workers', type=int,
+            default=max(1, settings.THUMBNAIL_WORKERS),
+            help='Сколько картинок обрабатывать одновременно.',
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers < 1:
+            raise CommandError('--workers должно быть не меньше 1.')
+        variants = card_variants()
+        names = (
+            Post.objects.exclude(image='').order_by('image')
+            .values_list('image', flat=True).distinct()
+        )
+        # В работе и в очереди не больше двух картинок на поток, а имена
+        # читаются порциями: память не растёт с числом постов.
+        slots = threading.BoundedSemaphore(workers * 2)
+        self.generated = self.failed = 0
+        self.lock = threading.Lock()
+        chunk = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for name in names.iterator():
+                chunk.append(name)
+                if len(chunk) == CHUNK_SIZE:
+                    self.submit(pool, slots, chunk, variants)
+                    chunk = []
+            self.submit(pool, slots, chunk, variants)
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок обработано: {self.generated}, ошибок: {self.failed}'))
+
+    def submit(self, pool, slots, names, variants):
+        ready = default.backend.get_ready_many(names, variants)
+        for name, found in ready.items():
+            missing = [
+                variant for index, variant in enumerate(variants)
+                if index not in found
+            ]
+            if missing:
+                slots.acquire()
+                pool.submit(self.run, slots, name, missing)
+
+    def run(self, slots, name, variants):
+        try:
+            generate(name, variants)
+        except Exception as error:
+            self.stderr.write(f'{name}: {error}')
+            with self.lock:
+                self.failed += 1
+        else:
+            with self.lock:
+                self.generated += 1
+        finally:
+            slots.release()
+            connection.close()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов из общего каталога в каталоги по '
+        'хешу содержимого; одинаковые файлы хранятся один раз.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=storage.BATCH_SIZE,
+            help='Сколько имён файлов читать из базы за раз.',
+        )
+
+    def handle(self, *args, **options):
+        moved, failed = storage.migrate_legacy(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {moved}, ошибок: {failed}'))
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+# Внешний контент: FTS5 хранит только индекс, текст читается из
+# posts_post. Триггеры синхронизации ставит posts.search.install_triggers
+# после каждой миграции: SQLite пересоздаёт posts_post при изменении
+# полей, и триггеры при этом пропадают.
+CREATE_SQL = '''
+    CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+        text,
+        content='posts_post',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+'''
+DROP_SQL = 'DROP TABLE IF EXISTS posts_post_fts'
+
+
+def run_on_sqlite(statement):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'sqlite':
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_image_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_sqlite(CREATE_SQL), run_on_sqlite(DROP_SQL)),
+    ]
@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
 
 User = get_user_model()
@@ -27,6 +27,27 @@ class Post(models.Model):
     class Meta:
         ordering = ('-pub_date', )
         default_related_name = 'posts'
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'), name='post_pub_date_id_idx'),
+            # Ленты группы и автора: фильтр и порядок страницы из индекса.
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_pub_date_idx',
+            ),
+            # Последняя правка ленты для ETag.
+            models.Index(fields=('edited',), name='post_edited_idx'),
+            models.Index(
+                fields=('group', 'edited'), name='post_group_edited_idx'),
+            models.Index(
+                fields=('author', 'edited'), name='post_author_edited_idx'),
+            # Сколько постов ссылается на файл картинки.
+            models.Index(fields=('image',), name='post_image_idx'),
+        )
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -38,6 +59,10 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True,
     )
+    edited = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
     group = models.ForeignKey(
         'Group',
         related_name='posts',
@@ -57,13 +82,60 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True,
     )
+    comments_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False,
+    )
+    # Не width_field/height_field у ImageField: тогда Django открывал бы
+    # файл при каждой загрузке поста, у которого размеры ещё не заполнены.
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    image_placeholder = models.TextField(
+        'Заглушка картинки',
+        blank=True,
+        editable=False,
+        help_text='Размытая копия картинки (LQIP) в виде data URI',
+    )
 
     def __str__(self):
         return self.text[:NUMBER_OF_LETTERS]
 
+    def save(self, *args, **kwargs):
+        # comments_count меняет только UPDATE с F() (counters.shift_post):
+        # полное сохранение загруженного раньше поста записало бы старое
+        # значение поверх комментариев, добавленных за это время.
+        if not (self._state.adding or args) and kwargs.get(
+                'update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'comments_count'
+            ]
+        # Выбор файла картинки по содержимому (pre_save) и запись поста
+        # в одной транзакции, иначе storage._release может удалить файл
+        # между ними.
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     class Meta:
+        indexes = (
+            models.Index(
+                fields=('post', 'created', 'id'),
+                name='comment_post_created_idx',
+            ),
+        )
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -109,6 +181,11 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ('user', 'author')
+        indexes = (
+            # Подписчики автора без чтения самой таблицы.
+            models.Index(
+                fields=('author', 'user'), name='follow_author_user_idx'),
+        )
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
 
@@ -116,3 +193,91 @@ class Follow(models.Model):
         if self.user == self.author:
             raise ValidationError("Вы не можете подписаться сами на себя.")
         super().clean()
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок конкретного пользователя.
+
+    Лента заполняется при публикации поста (fan-out on write), поэтому
+    страница «Избранные авторы» читается одним диапазоном по индексу
+    (user, pub_date), сколько бы авторов ни было в подписках.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-post_id')
+        unique_together = ('user', 'post')
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='timeline_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=('user', 'author'), name='timeline_user_author_idx'),
+        )
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+
+class PopularAuthor(models.Model):
+    """Автор, чьи посты не раскладываются по лентам подписчиков.
+
+    У таких авторов слишком много подписчиков для fan-out on write,
+    их свежие посты подмешиваются в ленту при чтении.
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='popularity',
+        verbose_name='Автор',
+    )
+    since = models.DateTimeField('Популярен с', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Популярный автор'
+        verbose_name_plural = 'Популярные авторы'
+
+    def __str__(self):
+        return str(self.author)
+
+
+class UserCounters(models.Model):
+    """Счётчики пользователя, которые иначе считались бы COUNT(*).
+
+    Обновляются сигналами при создании и удалении постов и подписок,
+    расхождения исправляет команда reconcile_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='counters',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user)
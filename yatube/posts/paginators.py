@@ -0,0 +1,193 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+KEYSET_ORDERING = ('-pub_date', '-id')
+ESTIMATED_COUNT_LIMIT = 10000
+
+
+def _split_ordering(ordering):
+    return [
+        (name.lstrip('-'), name.startswith('-')) for name in ordering
+    ]
+
+
+def seek_condition(fields, values, forward):
+    """Условие «строго после курсора» в заданном направлении.
+
+    Нестрогая граница по первому полю дублирует условие, чтобы
+    SQLite мог выбрать диапазон по индексу, а не проверять OR
+    для каждой строки.
+    """
+    first_name, first_descending = fields[0]
+    bound = 'lte' if first_descending == forward else 'gte'
+    condition = Q()
+    for position, (name, descending) in enumerate(fields):
+        lookup = 'lt' if descending == forward else 'gt'
+        step = Q(**{f'{name}__{lookup}': values[position]})
+        for prev_position, (prev_name, _) in enumerate(fields[:position]):
+            step &= Q(**{prev_name: values[prev_position]})
+        condition |= step
+    return Q(**{f'{first_name}__{bound}': values[0]}) & condition
+
+
+class KeysetPaginator:
+    """Постраничный вывод по курсору без COUNT(*) и OFFSET.
+
+    Страница ищется по индексу от последней (или первой) записи
+    предыдущей страницы, поэтому время выборки не зависит от того,
+    насколько далеко пользователь пролистал ленту.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, per_page, ordering=KEYSET_ORDERING):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = _split_ordering(self.ordering)
+
+    def encode_cursor(self, obj):
+        opts = self.object_list.model._meta
+        values = [
+            opts.get_field(name).value_to_string(obj)
+            for name, _ in self.fields
+        ]
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        """Возвращает значения ключа из токена или None, если он испорчен."""
+        if not token:
+            return None
+        opts = self.object_list.model._meta
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if not isinstance(values, list) or (
+                    len(values) != len(self.fields)):
+                return None
+            return [
+                opts.get_field(name).to_python(value)
+                for (name, _), value in zip(self.fields, values)
+            ]
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            return None
+
+    def _seek(self, values, forward):
+        return seek_condition(self.fields, values, forward)
+
+    def _reversed_ordering(self):
+        return [
+            name if descending else f'-{name}'
+            for name, descending in self.fields
+        ]
+
+    def get_page(self, after=None, before=None):
+        """Страница после курсора after, перед курсором before
+        или первая страница, если курсоров нет или они испорчены.
+        """
+        after_values = self.decode_cursor(after)
+        before_values = None if after_values else self.decode_cursor(before)
+        limit = self.per_page + 1
+        if before_values is not None:
+            rows = self._fetch(before_values, forward=False, limit=limit)
+            if len(rows) <= self.per_page:
+                return self.get_page()
+            rows = rows[:self.per_page][::-1]
+            return self._get_page(
+                rows,
+                previous_cursor=self.encode_cursor(rows[0]),
+                next_cursor=self.encode_cursor(rows[-1]),
+                cursor=f'before:{before}',
+            )
+        rows = self._fetch(after_values, forward=True, limit=limit)
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return self._get_page(
+            rows,
+            previous_cursor=(
+                self.encode_cursor(rows[0])
+                if rows and after_values is not None else None),
+            next_cursor=self.encode_cursor(rows[-1]) if has_next else None,
+            cursor=None if after_values is None else f'after:{after}',
+        )
+
+    def _fetch(self, values, forward, limit):
+        """Первые limit строк после курсора values в направлении ленты
+        (forward) или в обратном.
+        """
+        ordering = self.ordering if forward else self._reversed_ordering()
+        queryset = self.object_list.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward))
+        return list(queryset[:limit])
+
+    def _get_page(self, *args, **kwargs):
+        """Аналог Paginator._get_page: точка расширения для подклассов."""
+        return KeysetPage(*args, paginator=self, **kwargs)
+
+
+class KeysetPage(Sequence):
+    """Страница с интерфейсом django.core.paginator.Page для шаблонов.
+
+    cursor — курсор запроса, которым выбрана страница, None для первой.
+    """
+
+    def __init__(self, object_list, paginator, previous_cursor, next_cursor,
+                 cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.previous_cursor = previous_cursor
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    def __repr__(self):
+        return f'<KeysetPage of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def number(self):
+        """1 только для первой страницы, иначе курсор запроса.
+
+        По number шаблоны строят ключ кэша фрагментов: пустая страница
+        за концом ленты не должна попасть под ключ первой.
+        """
+        return self.cursor or 1
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator без полного COUNT(*) для больших таблиц.
+
+    Без фильтров число строк оценивается по наибольшему первичному
+    ключу — это один шаг по индексу. С фильтрами строки считаются,
+    но не дальше ESTIMATED_COUNT_LIMIT.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list.order_by()
+        if not queryset.query.where:
+            last_pk = (
+                queryset.order_by('-pk').values_list('pk', flat=True).first())
+            return last_pk or 0
+        return queryset[:ESTIMATED_COUNT_LIMIT].count()
@@ -0,0 +1,124 @@
+import re
+from collections import namedtuple
+
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from .models import Group, Post, User
+
+# Полный проход по таблице и сортировка во временном B-дереве — то, что
+# на миллионах строк превращает запрос страницы в секунды.
+FULL_SCAN = re.compile(r'^SCAN (?P<table>\w+)$')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE')
+# Таблицы, которые представления честно читают целиком: список групп
+# в форме поста.
+FULL_SCAN_ALLOWED = {'posts_group'}
+# Индекс автодополнения один раз за процесс читает имена целиком.
+VIEW_FULL_SCANS = {'posts:autocomplete': {'auth_user', 'posts_group'}}
+# Поиск по FTS5 сортирует найденные строки по bm25: такой порядок не
+# может дать ни один индекс, сортируются только совпадения.
+RANKED = re.compile(r'^SCAN \w+ VIRTUAL TABLE INDEX')
+# EXPLAIN делает и журнал медленных запросов core.flight_recorder.
+SKIPPED = (
+    'SAVEPOINT', 'RELEASE', 'ROLLBACK', 'BEGIN', 'COMMIT', 'EXPLAIN')
+
+Query = namedtuple('Query', 'view sql params plan problems')
+
+
+class _Recorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and not sql.lstrip().upper().startswith(SKIPPED):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def explain(sql, params):
+    """Строки detail из EXPLAIN QUERY PLAN."""
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def problems(plan, allowed=FULL_SCAN_ALLOWED):
+    """Полные проходы и сортировки, которых не должно быть в плане."""
+    found = []
+    ranked = any(RANKED.match(step) for step in plan)
+    for step in plan:
+        scan = FULL_SCAN.match(step)
+        if scan and scan.group('table') not in allowed:
+            found.append(f'полный проход: {step}')
+        if TEMP_SORT.search(step) and not ranked:
+            found.append(f'сортировка: {step}')
+    return found
+
+
+def view_requests(post, group, author, reader):
+    """(пользователь, метод, имя URL, kwargs, данные) для каждого
+    представления posts."""
+    post_id = {'post_id': post.pk}
+    return (
+        (None, 'get', 'posts:index', {}, {}),
+        (None, 'get', 'posts:group_list', {'slug': group.slug}, {}),
+        (None, 'get', 'posts:profile', {'username': author.username}, {}),
+        (reader, 'get', 'posts:profile', {'username': author.username}, {}),
+        (None, 'get', 'posts:post_detail', post_id, {}),
+        (None, 'get', 'posts:post_comments', post_id, {'order': 'new'}),
+        (reader, 'get', 'posts:follow_index', {}, {}),
+        (None, 'get', 'posts:search', {}, {
+            'q': 'пост', 'group': group.slug, 'author': author.username}),
+        (None, 'get', 'posts:autocomplete', {}, {
+            'q': author.username[:3]}),
+        (author, 'get', 'posts:post_create', {}, {}),
+        (author, 'post', 'posts:post_create', {}, {'text': 'Новый пост'}),
+        (author, 'get', 'posts:post_edit', post_id, {}),
+        (author, 'post', 'posts:post_edit', post_id, {'text': 'Правка'}),
+        (reader, 'post', 'posts:add_comment', post_id, {'text': 'Текст'}),
+        (reader, 'get', 'posts:profile_unfollow',
+         {'username': author.username}, {}),
+        (reader, 'get', 'posts:profile_follow',
+         {'username': author.username}, {}),
+    )
+
+
+def seeded_requests():
+    """view_requests для самых тяжёлых страниц заполненной базы.
+
+    Самый популярный автор и его самый обсуждаемый пост: страницы с
+    наибольшими лентами и списками комментариев. None, если в базе нет
+    постов, группы или двух пользователей.
+    """
+    author = User.objects.filter(posts__isnull=False).order_by(
+        '-counters__followers_count', 'pk').first()
+    post = Post.objects.filter(author=author).order_by(
+        '-comments_count', '-pk').first()
+    reader = User.objects.exclude(pk=getattr(author, 'pk', None)).order_by(
+        '-counters__following_count', 'pk').first()
+    group = getattr(post, 'group', None) or Group.objects.annotate(
+        total=Count('posts')).order_by('-total', 'pk').first()
+    if None in (post, author, reader, group):
+        return None
+    return view_requests(post, group, author, reader)
+
+
+def collect(requests):
+    """Выполняет запросы к представлениям и возвращает план каждого
+    SQL-запроса, который они сделали."""
+    results = []
+    for user, method, name, kwargs, data in requests:
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        recorder = _Recorder()
+        with connection.execute_wrapper(recorder):
+            getattr(client, method)(reverse(name, kwargs=kwargs), data)
+        for sql, params in recorder.queries:
+            plan = explain(sql, params)
+            allowed = FULL_SCAN_ALLOWED | VIEW_FULL_SCANS.get(name, set())
+            results.append(
+                Query(name, sql, params, plan, problems(plan, allowed)))
+    return results
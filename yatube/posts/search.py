@@ -0,0 +1,180 @@
+import base64
+import binascii
+import json
+import re
+
+from django.db import connection, connections
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .paginators import KeysetPage
+
+FTS_TABLE = 'posts_post_fts'
+# Границы совпадения в snippet(): символы, которых нет в тексте постов,
+# чтобы подсветка вставлялась уже после экранирования HTML.
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_TOKENS = 32
+WORD = re.compile(r'\w+')
+
+TRIGGERS = {
+    'posts_post_fts_insert': f'''
+        CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert
+        AFTER INSERT ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, text) VALUES (new.id, new.text);
+        END
+    ''',
+    'posts_post_fts_delete': f'''
+        CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete
+        AFTER DELETE ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END
+    ''',
+    'posts_post_fts_update': f'''
+        CREATE TRIGGER IF NOT EXISTS posts_post_fts_update
+        AFTER UPDATE OF text ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO {FTS_TABLE} (rowid, text) VALUES (new.id, new.text);
+        END
+    ''',
+}
+
+SEARCH_SQL = f'''
+    SELECT post.id, {FTS_TABLE}.rank,
+           snippet({FTS_TABLE}, 0, %s, %s, '…', %s)
+    FROM {FTS_TABLE}
+    JOIN posts_post AS post ON post.id = {FTS_TABLE}.rowid
+    WHERE {FTS_TABLE} MATCH %s {{filters}}
+    ORDER BY {FTS_TABLE}.rank, post.id
+    LIMIT %s
+'''
+
+
+def match_query(text):
+    """Запрос FTS5 из пользовательского ввода.
+
+    Каждое слово берётся в кавычки, чтобы операторы FTS5 из ввода не
+    разбирались, последнее слово ищется как префикс. Пустая строка,
+    если слов нет.
+    """
+    words = WORD.findall(text)
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def highlight(snippet):
+    escaped = escape(snippet)
+    return mark_safe(
+        escaped.replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+class SearchPaginator:
+    """Результаты поиска по релевантности страницами по курсору.
+
+    Курсор — (rank, id) последнего результата, поэтому следующая
+    страница не требует OFFSET. rank — значение bm25 из FTS5: чем
+    меньше, тем релевантнее.
+    """
+    is_keyset = True
+
+    def __init__(self, query, per_page, group_id=None, author_id=None):
+        self.query = match_query(query)
+        self.per_page = int(per_page)
+        self.filters = {'group_id': group_id, 'author_id': author_id}
+
+    @staticmethod
+    def encode_cursor(rank, post_id):
+        raw = json.dumps([rank, post_id]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(token):
+        if not token:
+            return None
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            rank, post_id = json.loads(base64.urlsafe_b64decode(padded))
+            return float(rank), int(post_id)
+        except (ValueError, TypeError, binascii.Error):
+            return None
+
+    def _fetch(self, cursor, limit):
+        filters = []
+        params = [MARK_START, MARK_END, SNIPPET_TOKENS, self.query]
+        for column, value in self.filters.items():
+            if value is not None:
+                filters.append(f'AND post.{column} = %s')
+                params.append(value)
+        if cursor is not None:
+            filters.append(
+                f'AND ({FTS_TABLE}.rank > %s '
+                f'OR ({FTS_TABLE}.rank = %s AND post.id > %s))')
+            params.extend((cursor[0], cursor[0], cursor[1]))
+        params.append(limit)
+        with connection.cursor() as db:
+            db.execute(SEARCH_SQL.format(filters=' '.join(filters)), params)
+            return db.fetchall()
+
+    def get_page(self, after=None):
+        """Страница после курсора after или первая страница."""
+        if not self.query:
+            return KeysetPage([], self, None, None)
+        cursor = self.decode_cursor(after)
+        rows = self._fetch(cursor, self.per_page + 1)
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [post_id for post_id, _, _ in rows])
+        results = []
+        for post_id, _, snippet in rows:
+            post = posts.get(post_id)
+            if post is not None:
+                post.snippet = highlight(snippet)
+                results.append(post)
+        next_cursor = None
+        if has_next:
+            last_id, last_rank, _ = rows[-1]
+            next_cursor = self.encode_cursor(last_rank, last_id)
+        return KeysetPage(
+            results, self,
+            previous_cursor=after if cursor is not None else None,
+            next_cursor=next_cursor,
+            cursor=None if cursor is None else f'after:{after}',
+        )
+
+
+def matching_ids(query):
+    """Подзапрос id постов по FTS5 для фильтра pk__in."""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (match_query(query),),
+    )
+
+
+def install_triggers(using='default', **kwargs):
+    """Ставит недостающие триггеры синхронизации и перестраивает индекс.
+
+    Подключается к post_migrate: миграции Post в SQLite пересоздают
+    таблицу вместе с триггерами, и без них индекс отстал бы от постов.
+    """
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return
+    with db.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')"
+            " AND name LIKE %s", [f'{FTS_TABLE}%'])
+        existing = {name for name, in cursor.fetchall()}
+        if FTS_TABLE not in existing or existing.issuperset(TRIGGERS):
+            return
+        for statement in TRIGGERS.values():
+            cursor.execute(statement)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
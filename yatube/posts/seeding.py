@@ -0,0 +1,189 @@
+import itertools
+import random
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Max
+from mixer.backend.django import Mixer
+from PIL import Image, ImageDraw
+
+from . import autocomplete, counters, timeline
+from .cache import bump_feeds, feed_name
+from .images import image_metadata
+from .models import Comment, Follow, Group, Post, User
+from .storage import UPLOAD_TO, content_name
+
+BATCH_SIZE = 2000
+PASSWORD = 'password'
+IMAGE_SIZE = (960, 640)
+IMAGE_VARIANTS = 20
+# Показатель закона Ципфа: немногие авторы пишут большую часть постов
+# и собирают большую часть подписчиков, как в живых соцсетях.
+ZIPF_EXPONENT = 1.1
+
+
+def zipf_weights(count, exponent=ZIPF_EXPONENT):
+    """Накопленные веса рангов 0..count-1 для random.choices."""
+    return list(itertools.accumulate(
+        1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+def _insert(model, objects, batch_size):
+    """bulk_create пачками; возвращает pk новых строк.
+
+    Размер одного INSERT выбирает Django по лимитам SQLite, batch_size
+    лишь ограничивает число объектов в памяти. bulk_create в SQLite не
+    возвращает pk, поэтому новые строки читаются по pk больше прежнего
+    максимума.
+    """
+    last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+    objects = iter(objects)
+    while True:
+        batch = list(itertools.islice(objects, batch_size))
+        if not batch:
+            break
+        model.objects.bulk_create(batch)
+    return list(
+        model.objects.filter(pk__gt=last_pk).order_by('pk')
+        .values_list('pk', flat=True)
+    )
+
+
+def _image(rng):
+    image = Image.new('RGB', IMAGE_SIZE, tuple(rng.choices(range(256), k=3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(8):
+        x, y = rng.randrange(IMAGE_SIZE[0]), rng.randrange(IMAGE_SIZE[1])
+        draw.ellipse(
+            (x, y, x + rng.randrange(50, 400), y + rng.randrange(50, 400)),
+            fill=tuple(rng.choices(range(256), k=3)),
+        )
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    return ContentFile(buffer.getvalue(), name='seed.jpg')
+
+
+def make_images(count, rng):
+    """Кладёт в storage count картинок под именами по содержимому.
+
+    Возвращает поля поста для каждой: image, image_width, image_height,
+    image_placeholder.
+    """
+    images = []
+    for _ in range(count):
+        file_ = _image(rng)
+        name = UPLOAD_TO + content_name(file_, file_.name)
+        if not default_storage.exists(name):
+            name = default_storage.save(name, file_)
+        width, height, placeholder = image_metadata(file_)
+        images.append({
+            'image': name,
+            'image_width': width,
+            'image_height': height,
+            'image_placeholder': placeholder,
+        })
+    return images
+
+
+def seed(users=1000, groups=20, posts=10000, comments=20000, follows=20,
+         image_share=0.3, seed=0, batch_size=BATCH_SIZE):
+    """Заполняет базу данными с распределениями как в проде.
+
+    Авторов постов, адресатов подписок и комментируемые посты выбирает
+    закон Ципфа; follows — среднее число подписок пользователя. Вставка
+    идёт пачками в обход сигналов, поэтому в конце пересчитываются
+    счётчики и ленты подписок. Возвращает {таблица: добавлено строк}.
+    """
+    rng = random.Random(seed)
+    mixer = Mixer(commit=False, locale='ru')
+    mixer.faker.seed_instance(seed)
+    faker = mixer.faker
+    password = make_password(PASSWORD)
+
+    first = (User.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+    user_pks = _insert(User, (
+        mixer.blend(
+            User,
+            username=f'{faker.user_name()}_{first + number}',
+            first_name=faker.first_name(),
+            last_name=faker.last_name(),
+            password=password,
+        )
+        for number in range(users)
+    ), batch_size)
+    first = (Group.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+    group_pks = _insert(Group, (
+        mixer.blend(
+            Group,
+            title=faker.sentence(nb_words=3).rstrip('.'),
+            slug=f'group-{first + number}',
+            description=faker.paragraph()[:400],
+        )
+        for number in range(groups)
+    ), batch_size)
+
+    # Популярность: одни и те же авторы пишут больше и собирают
+    # больше подписчиков.
+    ranked = rng.sample(user_pks, len(user_pks))
+    user_weights = zipf_weights(len(ranked))
+    images = make_images(min(IMAGE_VARIANTS, posts), rng) if (
+        image_share) else []
+    no_image = {
+        'image': '', 'image_width': None, 'image_height': None,
+        'image_placeholder': '',
+    }
+    post_pks = _insert(Post, (
+        mixer.blend(
+            Post,
+            text=faker.text(max_nb_chars=rng.choice((80, 200, 600))),
+            author=User(pk=rng.choices(ranked, cum_weights=user_weights)[0]),
+            group=Group(pk=rng.choice(group_pks)) if (
+                group_pks and rng.random() < 0.7) else None,
+            comments_count=0,
+            **(rng.choice(images) if images and (
+                rng.random() < image_share) else no_image),
+        )
+        for _ in range(posts)
+    ), batch_size)
+
+    ranked_posts = rng.sample(post_pks, len(post_pks))
+    post_weights = zipf_weights(len(ranked_posts))
+    comment_pks = _insert(Comment, (
+        mixer.blend(
+            Comment,
+            post=Post(pk=rng.choices(
+                ranked_posts, cum_weights=post_weights)[0]),
+            author=User(pk=rng.choice(user_pks)),
+            text=faker.sentence(),
+        )
+        for _ in range(comments if post_pks else 0)
+    ), batch_size)
+
+    def follow_pairs():
+        for user_pk in user_pks:
+            authors = set(rng.choices(
+                ranked, cum_weights=user_weights,
+                k=rng.randint(0, 2 * follows)))
+            authors.discard(user_pk)
+            for author_pk in authors:
+                yield Follow(user_id=user_pk, author_id=author_pk)
+
+    follow_pks = _insert(Follow, follow_pairs(), batch_size)
+
+    counters.reconcile_users(batch_size)
+    counters.reconcile_posts(batch_size)
+    timeline.refresh_popularity()
+    if user_pks:
+        timeline.rebuild(User.objects.filter(pk__gte=user_pks[0]))
+    autocomplete.invalidate()
+    bump_feeds(feed_name('index'))
+    return {
+        'users': len(user_pks),
+        'groups': len(group_pks),
+        'posts': len(post_pks),
+        'images': len(images),
+        'comments': len(comment_pks),
+        'follows': len(follow_pks),
+    }
@@ -0,0 +1,226 @@
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from . import autocomplete, counters, images, storage, timeline
+from .cache import affected_feeds, bump_feeds, feed_name, post_feeds
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+@receiver(post_save, sender=Post)
+def push_to_timelines(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and not timeline.update_popularity(
+            instance.author_id):
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def drop_from_timeline(sender, instance, **kwargs):
+    timeline.drop(instance.user_id, instance.author_id)
+    timeline.update_popularity(instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_state(sender, instance, raw=False, **kwargs):
+    instance._previous_group_id = None
+    instance._previous_author_id = None
+    instance._previous_image = ''
+    if instance.pk and not raw:
+        previous = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'author_id', 'image').first()
+        )
+        if previous is not None:
+            (instance._previous_group_id,
+             instance._previous_author_id,
+             instance._previous_image) = previous
+
+
+@receiver(pre_save, sender=Post)
+def describe_image(sender, instance, raw=False, **kwargs):
+    """Размеры, LQIP и имя по содержимому для новой картинки, пока она
+    ещё не записана в storage.
+    """
+    if raw:
+        return
+    if not instance.image:
+        instance.image_width = instance.image_height = None
+        instance.image_placeholder = ''
+    elif not instance.image._committed:
+        images.describe(instance)
+        storage.store_by_content(instance)
+
+
+@receiver(post_save, sender=Post)
+def release_previous_image(sender, instance, raw=False, **kwargs):
+    previous_image = getattr(instance, '_previous_image', '')
+    if not raw and previous_image != instance.image.name:
+        storage.release(previous_image)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    storage.release(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous_author_id = getattr(instance, '_previous_author_id', None)
+    if created:
+        counters.shift_user(instance.author_id, posts_count=1)
+    elif previous_author_id not in (None, instance.author_id):
+        counters.shift_user(previous_author_id, posts_count=-1)
+        counters.shift_user(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.shift_user(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.shift_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.shift_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.shift_user(instance.author_id, followers_count=1)
+        counters.shift_user(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.shift_user(instance.author_id, followers_count=-1)
+    counters.shift_user(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=User)
+def create_counters(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    bump_feeds(*post_feeds(instance, previous_group_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, **kwargs):
+    authors = (
+        Post.objects.filter(group_id=instance.pk)
+        .values_list('author_id', flat=True).distinct()
+    )
+    bump_feeds(
+        feed_name('index'),
+        feed_name('group', instance.pk),
+        *(feed_name('profile', author_id) for author_id in authors),
+    )
+
+
+def _fields_changed(update_fields, *fields):
+    return update_fields is None or bool(set(update_fields) & set(fields))
+
+
+# Имя пользователя показано в карточках его постов и в ссылках на
+# профиль.
+NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def _names(user):
+    return tuple(getattr(user, field) for field in NAME_FIELDS)
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_names(sender, instance, raw=False,
+                            update_fields=None, **kwargs):
+    instance._previous_names = None
+    # last_login при входе сохраняется с update_fields: лишний запрос
+    # на каждый вход не нужен.
+    if instance.pk and not raw and _fields_changed(
+            update_fields, *NAME_FIELDS):
+        instance._previous_names = (
+            User.objects.filter(pk=instance.pk)
+            .values_list(*NAME_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=User)
+def index_username(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_names', None)
+    previous = previous and previous[0]
+    if raw or not (created or previous not in (None, instance.username)):
+        return
+    autocomplete.record_change(
+        autocomplete.USERS, instance.pk,
+        autocomplete.user_keys(previous),
+        autocomplete.user_keys(instance.username),
+        instance.username,
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_feeds(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_names', None)
+    if raw or previous in (None, _names(instance)):
+        return
+    feeds = affected_feeds(Post.objects.filter(author_id=instance.pk))
+    bump_feeds(feed_name('profile', instance.pk), *feeds)
+
+
+@receiver(post_delete, sender=User)
+def unindex_username(sender, instance, **kwargs):
+    autocomplete.record_change(
+        autocomplete.USERS, instance.pk,
+        autocomplete.user_keys(instance.username), (), None)
+
+
+@receiver(pre_save, sender=Group)
+def remember_previous_group(sender, instance, raw=False, **kwargs):
+    instance._previous_group = None
+    if instance.pk and not raw:
+        instance._previous_group = (
+            Group.objects.filter(pk=instance.pk)
+            .values_list('title', 'slug').first()
+        )
+
+
+@receiver(post_save, sender=Group)
+def index_group(sender, instance, created, raw=False, **kwargs):
+    label = (instance.title, instance.slug)
+    previous = getattr(instance, '_previous_group', None)
+    if raw or previous == label:
+        return
+    autocomplete.record_change(
+        autocomplete.GROUPS, instance.pk,
+        autocomplete.group_keys(*previous) if previous else (),
+        autocomplete.group_keys(*label),
+        label,
+    )
+
+
+@receiver(post_delete, sender=Group)
+def unindex_group(sender, instance, **kwargs):
+    autocomplete.record_change(
+        autocomplete.GROUPS, instance.pk,
+        autocomplete.group_keys(instance.title, instance.slug), (), None)
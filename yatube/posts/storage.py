@@ -0,0 +1,128 @@
+import hashlib
+import logging
+import os
+import re
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from sorl.thumbnail import delete as delete_with_thumbnails
+
+from . import cache
+from . import thumbnails as post_thumbnails
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+UPLOAD_TO = Post._meta.get_field('image').upload_to
+# posts/ab/cd/<sha256>.ext: два уровня по 256 каталогов, чтобы ни в одном
+# каталоге не копились сотни тысяч файлов.
+SHARDED_NAME = re.compile(
+    r'^' + re.escape(UPLOAD_TO) + r'[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}'
+    r'(\.[0-9a-z]+)?$'
+)
+
+
+def content_name(file_, original_name):
+    """Имя файла по SHA-256 содержимого: ab/cd/abcd….ext."""
+    digest = hashlib.sha256()
+    file_.seek(0)
+    for chunk in file_.chunks():
+        digest.update(chunk)
+    file_.seek(0)
+    digest = digest.hexdigest()
+    extension = os.path.splitext(original_name)[1].lower()
+    return f'{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+def store_by_content(post):
+    """Кладёт новую картинку поста под именем по её содержимому.
+
+    Если такой файл уже есть, пост ссылается на него и файл не пишется
+    повторно. Вызывается до сохранения файла, в pre_save, внутри
+    транзакции Post.save: до её коммита _release этот файл не удалит.
+    """
+    image = post.image
+    field = image.field
+    name = content_name(image, image.name)
+    stored_name = field.generate_filename(post, name)
+    if image.storage.exists(stored_name):
+        image.name = stored_name
+        image._committed = True
+    else:
+        # Если тот же файл одновременно загружают двое, второй получит
+        # суффикс от storage: копия лишняя, но ссылки остаются верными.
+        image.name = name
+
+
+def release(name):
+    """После коммита удаляет файл и его миниатюры, если на него больше
+    не ссылается ни один пост.
+
+    Удаляются только файлы с именем по содержимому: на старые файлы из
+    общего каталога счёт ссылок не вёлся.
+    """
+    if name and SHARDED_NAME.match(name):
+        transaction.on_commit(lambda: _release(name))
+
+
+def _release(name):
+    # Проверка и удаление идут под блокировкой записи (BEGIN IMMEDIATE,
+    # SQLITE_TRANSACTION_MODE): пост, который в store_by_content выбрал
+    # этот же файл, сохранится целиком до проверки или после удаления,
+    # и тогда файл будет записан заново.
+    try:
+        with transaction.atomic():
+            if not Post.objects.filter(image=name).exists():
+                delete_with_thumbnails(name)
+    except OSError:
+        logger.exception('Не удалось удалить картинку %s', name)
+
+
+def _legacy_names(batch_size):
+    posts = (
+        Post.objects.exclude(image='')
+        .exclude(image__regex=SHARDED_NAME.pattern)
+        .order_by('image').values_list('image', flat=True).distinct()
+    )
+    last_name = ''
+    while True:
+        names = list(posts.filter(image__gt=last_name)[:batch_size])
+        if not names:
+            return
+        last_name = names[-1]
+        yield names
+
+
+def _move(name):
+    image = Post(image=name).image
+    with image.open('rb'):
+        target = image.field.generate_filename(
+            None, content_name(image, name))
+        if not image.storage.exists(target):
+            target = image.storage.save(target, image)
+    with transaction.atomic():
+        cache.touch_posts(Post.objects.filter(image=name), image=target)
+    delete_with_thumbnails(name)
+    post_thumbnails.schedule(target, post_thumbnails.card_variants())
+    return target
+
+
+def migrate_legacy(batch_size=BATCH_SIZE):
+    """Переносит картинки из общего каталога в каталоги по содержимому.
+
+    Сначала файл копируется, потом посты переключаются на новое имя,
+    и только затем удаляется старый файл, поэтому пост всё время
+    ссылается на существующий файл. Возвращает (перенесено, ошибок).
+    """
+    moved = failed = 0
+    for names in _legacy_names(batch_size):
+        for name in names:
+            try:
+                _move(name)
+            except (OSError, SuspiciousFileOperation):
+                logger.exception('Не удалось перенести картинку %s', name)
+                failed += 1
+            else:
+                moved += 1
+    return moved, failed
@@ -0,0 +1,125 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import counters
+from ..models import Comment, Group, Post, TimelineEntry
+from ..paginators import ESTIMATED_COUNT_LIMIT, EstimatedCountPaginator
+
+User = get_user_model()
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание')
+        cls.other_group = Group.objects.create(
+            title='Другая группа', slug='other', description='Описание')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:posts_post_changelist')
+
+    def create_posts(self, number, group=None):
+        return [
+            Post.objects.create(
+                text=f'Пост {index}', author=self.author, group=group)
+            for index in range(number)
+        ]
+
+    def changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        return [query['sql'] for query in queries.captured_queries]
+
+    def test_changelist_queries_do_not_grow(self):
+        """Без N+1 и без полного COUNT(*) по таблице постов."""
+        self.create_posts(2, self.group)
+        few = self.changelist_queries()
+        self.create_posts(20, self.other_group)
+        many = self.changelist_queries()
+        self.assertEqual(len(few), len(many))
+        self.assertFalse(any(
+            'COUNT(*)' in sql and 'posts_post' in sql for sql in many))
+
+    def test_estimated_count(self):
+        posts = self.create_posts(3)
+        paginator = EstimatedCountPaginator(Post.objects.all(), 100)
+        self.assertEqual(paginator.count, posts[-1].pk)
+        filtered = EstimatedCountPaginator(
+            Post.objects.filter(text='Пост 1'), 100)
+        self.assertEqual(filtered.count, 1)
+        self.assertGreater(ESTIMATED_COUNT_LIMIT, 0)
+
+    def run_action(self, action, posts, **data):
+        return self.client.post(self.url, {
+            'action': action,
+            '_selected_action': [post.pk for post in posts],
+            **data,
+        })
+
+    def test_move_to_group_with_one_update(self):
+        posts = self.create_posts(5, self.group)
+        with CaptureQueriesContext(connection) as queries:
+            self.run_action('move_to_group', posts, group=self.other_group.pk)
+        updates = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "posts_post"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            Post.objects.filter(group=self.other_group).count(), 5)
+
+    def test_delete_requires_confirmation(self):
+        posts = self.create_posts(2)
+        self.run_action('delete_posts', posts)
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_delete_posts_in_bulk(self):
+        """Посты с комментариями и записями лент удаляются, счётчики
+        авторов остаются верными."""
+        reader = User.objects.create_user(username='reader')
+        posts = self.create_posts(4)
+        for post in posts:
+            Comment.objects.create(post=post, author=reader, text='Текст')
+            TimelineEntry.objects.create(
+                user=reader, post=post, author=self.author,
+                pub_date=post.pub_date)
+        with CaptureQueriesContext(connection) as queries:
+            self.run_action('delete_posts', posts[:3], confirm='on')
+        deletes = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('DELETE FROM "posts_')
+        ]
+        self.assertEqual(len(deletes), 3)
+        self.assertEqual(list(Post.objects.all()), posts[3:])
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(TimelineEntry.objects.count(), 1)
+        self.assertEqual(counters.reconcile_users(), 0)
+
+    def test_date_hierarchy_without_distinct(self):
+        """Годы и месяцы для date_hierarchy ищутся по индексу."""
+        posts = self.create_posts(3)
+        dates = ('2021-03-05', '2021-07-01', '2023-01-31')
+        for post, value in zip(posts, dates):
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=f'{value} 12:00:00+00:00')
+        sql = ' '.join(self.changelist_queries())
+        self.assertNotIn('DISTINCT', sql)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'pub_date__year=2021')
+        self.assertContains(response, 'pub_date__year=2023')
+        self.assertNotContains(response, 'pub_date__year=2022')
+        response = self.client.get(self.url, {'pub_date__year': 2021})
+        self.assertContains(response, 'pub_date__month=3')
+        self.assertContains(response, 'pub_date__month=7')
@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from ..autocomplete import (
+    CHANGE_KEY, JOURNAL_KEY, Autocomplete, PrefixIndex, autocomplete,
+)
+from ..models import Group
+
+User = get_user_model()
+
+
+class PrefixIndexTests(TestCase):
+    def test_search_add_remove(self):
+        index = PrefixIndex([
+            ('anna', 1, 'Anna'),
+            ('andrey', 2, 'andrey'),
+            ('boris', 3, 'boris'),
+        ])
+        self.assertEqual(index.search('an'), ['andrey', 'Anna'])
+        index.add('ann', 4, 'ann')
+        self.assertEqual(index.search('ann'), ['ann', 'Anna'])
+        index.remove('anna', 1)
+        self.assertEqual(index.search('an', limit=1), ['andrey'])
+        self.assertEqual(index.search('z'), [])
+
+    def test_one_result_per_record(self):
+        """Запись с несколькими ключами попадает в ответ один раз."""
+        label = ('Кошки', 'cats')
+        index = PrefixIndex([('кошки', 1, label), ('cats', 1, label)])
+        index.add('catering', 2, ('Кейтеринг', 'catering'))
+        self.assertEqual(
+            index.search('cat'), [('Кейтеринг', 'catering'), label])
+
+
+class AutocompleteViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        User.objects.create_user(username='Leo')
+        User.objects.create_user(username='leonid')
+        User.objects.create_user(username='maria')
+        Group.objects.create(
+            title='Львы', slug='lions', description='Описание')
+
+    def setUp(self):
+        cache.clear()
+        autocomplete.indexes = None
+        self.url = reverse('posts:autocomplete')
+
+    def test_users_and_groups(self):
+        response = Client().get(self.url, {'q': 'LE'})
+        self.assertEqual(
+            [user['username'] for user in response.json()['users']],
+            ['Leo', 'leonid'])
+        response = Client().get(self.url, {'q': 'ль'})
+        self.assertEqual(response.json()['groups'], [{
+            'title': 'Львы',
+            'slug': 'lions',
+            'url': reverse('posts:group_list', args=('lions',)),
+        }])
+
+    def test_kind_filter(self):
+        response = Client().get(self.url, {'q': 'l', 'kind': 'groups'})
+        self.assertEqual(list(response.json()), ['groups'])
+
+    def test_no_queries_once_built(self):
+        Client().get(self.url, {'q': 'm'})
+        with self.assertNumQueries(0):
+            Client().get(self.url, {'q': 'ma'})
+
+
+class AutocompleteJournalTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_other_process_catches_up(self):
+        """Индекс, построенный раньше изменений, догоняет их по журналу."""
+        user = User.objects.create_user(username='oldname')
+        group = Group.objects.create(
+            title='Старая', slug='old', description='Описание')
+        index = Autocomplete()
+        self.assertEqual(index.search('old')['users'], ['oldname'])
+        user.username = 'newname'
+        user.save()
+        group.slug = 'fresh'
+        group.save()
+        User.objects.create_user(username='newcomer')
+        found = index.search('ne')
+        self.assertEqual(found['users'], ['newcomer', 'newname'])
+        self.assertEqual(index.search('old'), {'users': [], 'groups': []})
+        self.assertEqual(
+            index.search('fre')['groups'], [('Старая', 'fresh')])
+        user.delete()
+        self.assertEqual(index.search('newn')['users'], [])
+
+    def test_lost_journal_entry_rebuilds(self):
+        index = Autocomplete()
+        index.search('a')
+        User.objects.create_user(username='anna')
+        cache.delete(CHANGE_KEY.format(cache.get(JOURNAL_KEY)))
+        self.assertEqual(index.search('an')['users'], ['anna'])
+
+    def test_evicted_counter_does_not_repeat_numbers(self):
+        """После вытеснения счётчика журнала номера не начинаются
+        заново, и индекс не пропускает изменения."""
+        User.objects.create_user(username='anna')
+        index = Autocomplete()
+        index.search('a')
+        cache.delete(JOURNAL_KEY)
+        User.objects.create_user(username='andrei')
+        self.assertGreater(cache.get(JOURNAL_KEY), index.position)
+        self.assertEqual(
+            index.search('an')['users'], ['andrei', 'anna'])
@@ -0,0 +1,158 @@
+import hashlib
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..cache import (
+    PAGE_CACHE_STATS, PAGE_LOCK_KEY, card_key, page_cache_stats,
+    render_cards,
+)
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for number in range(3):
+            Post.objects.create(
+                text=f'Тестовый пост {number}',
+                author=cls.author,
+                group=cls.group,
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_follow_page_reuses_index_cards(self):
+        """Лента подписок берёт карточки, отрисованные для главной."""
+        self.reader_client.get(reverse('posts:index'))
+        with mock.patch('posts.cache.render_to_string') as render:
+            response = self.reader_client.get(reverse('posts:follow_index'))
+        render.assert_not_called()
+        self.assertContains(response, 'Тестовый пост 2')
+
+    def test_cards_fetched_with_one_get_many(self):
+        """Все карточки страницы читаются одним обращением к кэшу."""
+        posts = Post.objects.select_related('author', 'group')
+        render_cards(posts)
+        with mock.patch('posts.cache.cache.get_many',
+                        wraps=cache.get_many) as get_many:
+            cards = render_cards(posts)
+        get_many.assert_called_once()
+        self.assertEqual(len(cards), len(posts))
+
+    def test_edit_changes_card_key(self):
+        """Редактирование поста меняет ключ его карточки."""
+        post = Post.objects.select_related('author', 'group').first()
+        key = card_key(post, True, True)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertNotEqual(key, card_key(post, True, True))
+
+    def test_rename_refreshes_feeds(self):
+        """После смены имени автора главная, группа и профиль
+        показывают новое имя и ссылку на новый профиль."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+        )
+        for url in urls:
+            self.reader_client.get(url)
+        self.reader_client.get(
+            reverse('posts:profile', kwargs={'username': 'author'}))
+        author = User.objects.get(pk=self.author.pk)
+        author.username = 'renamed'
+        author.first_name = 'Новое'
+        author.save()
+        urls += (reverse('posts:profile', kwargs={'username': 'renamed'}),)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                self.assertContains(response, '/profile/renamed/')
+                self.assertContains(response, 'Новое')
+                self.assertNotContains(response, '/profile/author/')
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(text='Первый пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        PAGE_CACHE_STATS.clear()
+        self.guest_client = Client()
+        self.url = reverse('posts:index')
+
+    def lock_key(self):
+        path_hash = hashlib.md5(self.url.encode()).hexdigest()
+        return PAGE_LOCK_KEY.format(path_hash)
+
+    def hold_rebuild_lock(self):
+        cache.add(self.lock_key(), 1)
+
+    def test_second_request_is_a_hit(self):
+        """Повторный запрос гостя отдаётся из кэша без отрисовки."""
+        self.guest_client.get(self.url)
+        response = self.guest_client.get(self.url)
+        self.assertIsNone(response.context)
+        self.assertContains(response, 'Первый пост')
+        self.assertEqual(page_cache_stats(), {'miss': 1, 'hit': 1})
+
+    def test_stale_copy_while_other_request_rebuilds(self):
+        """Пока страницу пересобирает другой запрос, отдаётся старая копия."""
+        self.guest_client.get(self.url)
+        Post.objects.create(text='Второй пост', author=self.author)
+        self.hold_rebuild_lock()
+        response = self.guest_client.get(self.url)
+        self.assertNotContains(response, 'Второй пост')
+        self.assertEqual(page_cache_stats()['stale'], 1)
+
+    def test_stale_copy_keeps_its_etag(self):
+        """Старая копия отдаётся с прежним ETag, и после пересборки
+        клиент с ним получает новую страницу, а не 304."""
+        etag = self.guest_client.get(self.url)['ETag']
+        Post.objects.create(text='Второй пост', author=self.author)
+        self.hold_rebuild_lock()
+        stale = self.guest_client.get(self.url)
+        self.assertEqual(stale['ETag'], etag)
+        self.assertFalse(stale.has_header('Last-Modified'))
+        cache.delete(self.lock_key())
+        response = self.guest_client.get(
+            self.url, HTTP_IF_NONE_MATCH=stale['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Второй пост')
+
+    @override_settings(PAGE_CACHE_WAIT=0.1)
+    def test_waits_then_renders_without_copy(self):
+        """Без копии запрос ждёт пересборку, а потом рисует сам."""
+        self.hold_rebuild_lock()
+        response = self.guest_client.get(self.url)
+        self.assertContains(response, 'Первый пост')
+        self.assertEqual(page_cache_stats(), {'miss': 1})
+
+    def test_authenticated_users_bypass_cache(self):
+        """Страницы авторизованных пользователей не кэшируются."""
+        client = Client()
+        client.force_login(self.author)
+        client.get(self.url)
+        client.get(self.url)
+        self.assertEqual(page_cache_stats(), {})
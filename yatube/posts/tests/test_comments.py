@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+from ..views import NUMBER_OF_COMMENTS
+
+User = get_user_model()
+# Состояние для ETag, пост с автором и группой, страница комментариев.
+DETAIL_QUERY_BUDGET = 3
+
+
+class PostCommentsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.author, group=cls.group)
+        cls.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk})
+        cls.fragment_url = reverse(
+            'posts:post_comments', kwargs={'post_id': cls.post.pk})
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def add_comments(self, total):
+        for number in range(total):
+            commenter = User.objects.create_user(
+                username=f'reader-{Comment.objects.count()}')
+            Comment.objects.create(
+                post=self.post, author=commenter, text=f'Комментарий {number}')
+
+    def test_query_budget_does_not_grow(self):
+        """Число запросов страницы поста не зависит от комментариев."""
+        self.add_comments(2)
+        with self.assertNumQueries(DETAIL_QUERY_BUDGET):
+            self.guest_client.get(self.detail_url)
+        self.add_comments(NUMBER_OF_COMMENTS * 2)
+        with self.assertNumQueries(DETAIL_QUERY_BUDGET):
+            response = self.guest_client.get(self.detail_url)
+        self.assertEqual(len(response.context['comments']), NUMBER_OF_COMMENTS)
+
+    def test_fragment_walks_all_comments(self):
+        """Фрагмент отдаёт следующие порции комментариев по курсору."""
+        self.add_comments(NUMBER_OF_COMMENTS + 5)
+        first = self.guest_client.get(self.detail_url).context['comments']
+        response = self.guest_client.get(
+            self.fragment_url, {'after': first.next_cursor})
+        self.assertTemplateUsed(response, 'includes/comments.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        rest = response.context['comments']
+        self.assertEqual(
+            [comment.pk for comment in [*first, *rest]],
+            list(Comment.objects.order_by('created', 'id')
+                 .values_list('pk', flat=True)),
+        )
+        self.assertFalse(rest.has_next())
+
+    def test_newest_first(self):
+        self.add_comments(3)
+        response = self.guest_client.get(self.detail_url, {'order': 'new'})
+        self.assertEqual(
+            response.context['comments'][0],
+            Comment.objects.order_by('-created', '-id').first(),
+        )
@@ -0,0 +1,159 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.author,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def revalidate(self, client, url):
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_not_modified_with_one_query(self):
+        """Неизменившаяся страница отдаёт 304 за один запрос к БД."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                with self.assertNumQueries(1):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_if_modified_since_not_trusted(self):
+        """Страницы без Last-Modified: удаление поста и подписка не
+        меняют время последней правки, и If-Modified-Since дал бы 304 на
+        изменившуюся страницу."""
+        index = reverse('posts:index')
+        profile = reverse('posts:profile', kwargs={'username': 'author'})
+        since = http_date()
+        for url in (index, profile):
+            with self.subTest(url=url):
+                self.assertFalse(
+                    self.reader_client.get(url).has_header('Last-Modified'))
+        Post.objects.create(text='Удалённый пост', author=self.reader).delete()
+        Follow.objects.create(user=self.reader, author=self.author)
+        for url in (index, profile):
+            with self.subTest(url=url):
+                response = self.reader_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=since)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_changes_invalidate_etag(self):
+        """Новый пост и комментарий меняют ETag лент и страницы поста."""
+        index = reverse('posts:index')
+        detail = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+        index_etag = self.guest_client.get(index)['ETag']
+        detail_etag = self.guest_client.get(detail)['ETag']
+        Post.objects.create(text='Новый пост', author=self.author)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        for url, etag in ((index, index_etag), (detail, detail_etag)):
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_follow_changes_profile_and_feed(self):
+        """Подписка меняет ETag профиля и ленты подписок пользователя."""
+        profile = reverse('posts:profile', kwargs={'username': 'author'})
+        follow_index = reverse('posts:follow_index')
+        profile_etag = self.reader_client.get(profile)['ETag']
+        feed_etag = self.reader_client.get(follow_index)['ETag']
+        self.assertEqual(
+            self.revalidate(self.reader_client, follow_index).status_code,
+            HTTPStatus.NOT_MODIFIED,
+        )
+        self.reader_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'author'}))
+        for url, etag in ((profile, profile_etag), (follow_index, feed_etag)):
+            with self.subTest(url=url):
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_etag_is_per_user(self):
+        """Гость и пользователь не получают чужую версию страницы."""
+        url = reverse('posts:index')
+        etag = self.guest_client.get(url)['ETag']
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_new_login_invalidates_etag(self):
+        """После нового входа страница с формой приходит с новым
+        CSRF-токеном, а не 304."""
+        self.reader.set_password('password')
+        self.reader.save()
+        credentials = {'username': 'reader', 'password': 'password'}
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        client = Client()
+        client.post(reverse('login'), credentials)
+        etag = client.get(url)['ETag']
+        client.get(reverse('logout'))
+        client.post(reverse('login'), credentials)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=2)
+    def test_follow_feed_fingerprint(self):
+        """Лента подписок меняет ETag при правке поста и новом посте
+        популярного автора, не читая посты через Follow ⋈ Post."""
+        follow_index = reverse('posts:follow_index')
+        Follow.objects.create(user=self.reader, author=self.author)
+        for name in ('first', 'second'):
+            popular = User.objects.create_user(username=name)
+            Follow.objects.create(user=popular, author=self.author)
+        self.assertTrue(hasattr(self.author, 'popularity'))
+        changes = (
+            self.post.save,
+            lambda: Post.objects.create(text='Новый', author=self.author),
+        )
+        etag = self.reader_client.get(follow_index)['ETag']
+        for change in changes:
+            change()
+            response = self.reader_client.get(
+                follow_index, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            etag = response['ETag']
+        with self.assertNumQueries(4) as queries:
+            response = self.reader_client.get(
+                follow_index, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        for query in queries:
+            self.assertNotIn('GROUP BY', query['sql'])
+            self.assertNotIn('COUNT(', query['sql'])
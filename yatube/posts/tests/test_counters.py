@@ -0,0 +1,104 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..counters import reconcile_posts, reconcile_users
+from ..models import Comment, Follow, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_posts_counted_on_create_and_delete(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        post.delete()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+
+    def test_follow_and_unfollow(self):
+        """Подписка и отписка меняют счётчики обоих пользователей."""
+        self.reader_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'author'}))
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'author'}))
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+
+    def test_comments_counted(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.reader_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'Комментарий'},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        Comment.objects.filter(post=post).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_edit_keeps_concurrent_comments(self):
+        """Сохранение поста, загруженного до комментария, не затирает
+        счётчик комментариев."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        author_client = Client()
+        author_client.force_login(self.author)
+        stale = Post.objects.get(pk=post.pk)
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        stale.text = 'Новый текст'
+        stale.save()
+        author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Ещё текст'},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Ещё текст')
+        self.assertEqual(post.comments_count, 1)
+
+    def test_cascade_from_deleted_user(self):
+        """Удаление пользователя уменьшает счётчики тех, кто с ним связан."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        self.reader.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+
+    def test_profile_reads_counter(self):
+        """Число постов в профиле берётся из счётчика, а не COUNT(*)."""
+        Post.objects.create(text='Пост', author=self.author)
+        UserCounters.objects.filter(user=self.author).update(posts_count=7)
+        response = self.reader_client.get(
+            reverse('posts:profile', kwargs={'username': 'author'}))
+        self.assertContains(response, 'Всего постов: 7')
+
+    def test_reconcile_repairs_drift(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        UserCounters.objects.filter(user=self.author).update(
+            posts_count=5, followers_count=0)
+        UserCounters.objects.filter(user=self.reader).delete()
+        Post.objects.filter(pk=post.pk).update(comments_count=3)
+        self.assertEqual(reconcile_users(batch_size=1), 2)
+        self.assertEqual(reconcile_posts(batch_size=1), 1)
+        author = self.counters(self.author)
+        self.assertEqual(
+            (author.posts_count, author.followers_count), (1, 1))
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(reconcile_users(), 0)
@@ -9,12 +9,13 @@ from django.urls import reverse
 from http import HTTPStatus
 
 from ..models import Comment, Group, Post
+from ..storage import SHARDED_NAME
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostCreateFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -75,7 +76,7 @@ class PostCreateFormTests(TestCase):
             text=form_data['text'],
             group=form_data['group'],
             author=self.user,
-            image='posts/small.gif'
+            image__regex=SHARDED_NAME.pattern,
         ).exists())
 
     def test_edit_post(self):
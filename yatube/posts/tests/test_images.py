@@ -0,0 +1,87 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..thumbnails import card_variants, generate
+from .utils import uploaded_gif
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ImageMetadataTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_upload_stores_size_and_placeholder(self):
+        """Размеры и LQIP считаются при загрузке картинки."""
+        post = Post.objects.create(
+            text='Пост', author=self.author, image=uploaded_gif())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,'))
+
+    def test_removing_image_clears_metadata(self):
+        post = Post.objects.create(
+            text='Пост', author=self.author, image=uploaded_gif())
+        post.image = None
+        post.save()
+        post.refresh_from_db()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_placeholder, '')
+
+    def test_backfill_command(self):
+        """Команда заполняет старые посты и пропускает потерянные файлы."""
+        posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=self.author,
+                image=uploaded_gif(f'old-{number}.gif'))
+            for number in range(3)
+        ]
+        Post.objects.create(
+            text='Без файла', author=self.author, image='posts/missing.gif')
+        Post.objects.update(
+            image_width=None, image_height=None, image_placeholder='')
+        out = StringIO()
+        call_command('backfill_image_metadata', batch_size=2, stdout=out)
+        self.assertIn('Заполнено постов: 3, не удалось прочитать: 1',
+                      out.getvalue())
+        for post in posts:
+            post.refresh_from_db()
+            self.assertEqual((post.image_width, post.image_height), (2, 1))
+
+    def test_templates_use_stored_size_without_storage(self):
+        """Заглушка и карточка берут размеры из базы, а не из файла."""
+        post = Post.objects.create(
+            text='Пост', author=self.author, image=uploaded_gif())
+        with mock.patch.object(
+                post.image.storage, 'open') as storage_open:
+            response = Client().get(reverse('posts:index'))
+        storage_open.assert_not_called()
+        self.assertContains(response, 'aspect-ratio: 2 / 1')
+        generate(post.image.name, card_variants())
+        cache.clear()
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, post.image_placeholder)
@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..paginators import KeysetPaginator
+
+User = get_user_model()
+NUMBER_OF_CREATED_POST = 25
+POSTS_PER_PAGE = 10
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        Post.objects.bulk_create([Post(
+            text=f'Тестовый текст {number}',
+            author=cls.user,
+        ) for number in range(NUMBER_OF_CREATED_POST)])
+        cls.expected = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def setUp(self):
+        self.paginator = KeysetPaginator(Post.objects.all(), POSTS_PER_PAGE)
+
+    def test_walk_forward_and_back(self):
+        """Проходим ленту вперёд по after и назад по before."""
+        pages = [self.paginator.get_page()]
+        while pages[-1].has_next():
+            pages.append(
+                self.paginator.get_page(after=pages[-1].next_cursor))
+        walked = [post for page in pages for post in page]
+        self.assertEqual(walked, self.expected)
+        self.assertFalse(pages[0].has_previous())
+        self.assertEqual(len(pages[-1]), NUMBER_OF_CREATED_POST % 10)
+        previous = self.paginator.get_page(
+            before=pages[-1].previous_cursor)
+        self.assertEqual(list(previous), list(pages[-2]))
+        self.assertTrue(previous.has_next())
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный токен отдаёт первую страницу."""
+        page = self.paginator.get_page(after='не-токен')
+        self.assertEqual(list(page), self.expected[:POSTS_PER_PAGE])
+
+    def test_page_does_not_count(self):
+        """Страница по курсору не делает COUNT(*)."""
+        cursor = self.paginator.get_page().next_cursor
+        with self.assertNumQueries(1):
+            list(self.paginator.get_page(after=cursor))
+
+    @override_settings(POSTS_KEYSET_PAGINATION=True)
+    def test_feed_uses_cursor_links(self):
+        """Лента в режиме курсора выводит ссылки ?after=."""
+        response = Client().get(reverse(
+            'posts:profile', kwargs={'username': self.user.username}))
+        page_obj = response.context['page_obj']
+        self.assertIsInstance(page_obj.paginator, KeysetPaginator)
+        self.assertContains(response, f'?after={page_obj.next_cursor}')
+
+    @override_settings(POSTS_KEYSET_PAGINATION=True)
+    def test_empty_page_keeps_first_page_cache(self):
+        """Пустая страница за концом ленты не кэшируется вместо первой."""
+        cache.clear()
+        after = self.paginator.encode_cursor(self.expected[-1])
+        last = self.paginator.get_page(after=after)
+        self.assertEqual(len(last), 0)
+        self.assertNotEqual(last.number, 1)
+        self.assertEqual(self.paginator.get_page().number, 1)
+        client = Client()
+        client.get(reverse('posts:index'), {'after': after})
+        response = client.get(reverse('posts:index'))
+        self.assertContains(response, self.expected[0].text)
@@ -0,0 +1,98 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import resolve, reverse
+
+from .. import urls, views
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+NUMBER_OF_CREATED_POST = 15
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create([Post(
+            text=f'Тестовый текст {number}',
+            author=cls.author,
+            group=cls.group,
+        ) for number in range(NUMBER_OF_CREATED_POST)])
+        cls.post = Post.objects.first()
+        for number in range(5):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Комментарий {number}')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_every_view_has_budget(self):
+        for pattern in urls.urlpatterns:
+            with self.subTest(url=pattern.name):
+                self.assertTrue(hasattr(pattern.callback, 'query_budget'))
+
+    def test_views_within_budget(self):
+        """Ни одно представление posts не выходит за свой бюджет."""
+        post_id = {'post_id': self.post.pk}
+        requests = (
+            ('get', 'posts:index', {}, {}),
+            ('get', 'posts:group_list', {'slug': self.group.slug}, {}),
+            ('get', 'posts:profile', {'username': 'author'}, {}),
+            ('get', 'posts:post_detail', post_id, {}),
+            ('get', 'posts:post_comments', post_id, {}),
+            ('get', 'posts:follow_index', {}, {}),
+            ('get', 'posts:search', {}, {
+                'q': 'текст', 'group': 'test-slug', 'author': 'author'}),
+            ('get', 'posts:post_create', {}, {}),
+            ('post', 'posts:post_create', {}, {'text': 'Новый пост'}),
+            ('get', 'posts:post_edit', post_id, {}),
+            ('post', 'posts:post_edit', post_id, {'text': 'Новый текст'}),
+            ('post', 'posts:add_comment', post_id, {'text': 'Текст'}),
+            ('get', 'posts:profile_follow', {'username': 'reader'}, {}),
+            ('get', 'posts:profile_unfollow', {'username': 'reader'}, {}),
+            ('get', 'posts:autocomplete', {}, {'q': 'au'}),
+        )
+        clients = (Client(), self.reader_client, self.author_client)
+        for method, name, kwargs, data in requests:
+            url = reverse(name, kwargs=kwargs)
+            budget = resolve(url).func.query_budget
+            for client in clients:
+                with self.subTest(url=url, method=method):
+                    cache.clear()
+                    response = getattr(client, method)(url, data)
+                    self.assertLessEqual(
+                        response.wsgi_request.query_count, budget)
+
+    def test_violation_is_logged(self):
+        with mock.patch.object(views.index, 'query_budget', 0):
+            with self.assertLogs('core.query_budget', 'WARNING') as logs:
+                self.reader_client.get(reverse('posts:index'))
+        self.assertIn('posts:index', logs.output[0])
+
+    def test_counts_with_server_timing(self):
+        cache.clear()
+        with mock.patch.object(
+                connection, 'execute_wrapper',
+                wraps=connection.execute_wrapper) as execute_wrapper:
+            response = self.reader_client.get(reverse('posts:index'))
+        self.assertEqual(execute_wrapper.call_count, 1)
+        request = response.wsgi_request
+        self.assertGreater(request.query_count, 0)
+        self.assertLessEqual(
+            request.query_count, request.server_timings.sql_count)
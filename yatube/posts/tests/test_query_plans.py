@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post
+from ..query_plans import collect, problems, view_requests
+
+User = get_user_model()
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(
+                text=f'Тестовый пост {number}',
+                author=cls.author,
+                group=cls.group if number % 2 else None,
+            )
+            for number in range(30)
+        )
+        cls.post = Post.objects.first()
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_views_use_indexes(self):
+        """Запросы представлений обходятся без полных проходов и
+        сортировок во временном B-дереве."""
+        queries = collect(view_requests(
+            self.post, self.group, self.author, self.reader))
+        self.assertTrue(queries)
+        for query in queries:
+            with self.subTest(view=query.view, sql=query.sql):
+                self.assertEqual(query.problems, [])
+
+    def test_problems_in_plan(self):
+        """Проверка находит полный проход и сортировку, но не в поиске."""
+        self.assertEqual(len(problems([
+            'SCAN posts_post', 'USE TEMP B-TREE FOR ORDER BY'])), 2)
+        self.assertEqual(problems([
+            'SCAN posts_post USING INDEX post_pub_date_id_idx',
+            'SCAN posts_group',
+        ]), [])
+        self.assertEqual(problems([
+            'SCAN posts_post_fts VIRTUAL TABLE INDEX 0:M1',
+            'USE TEMP B-TREE FOR ORDER BY',
+        ]), [])
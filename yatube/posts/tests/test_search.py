@@ -0,0 +1,103 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..search import FTS_TABLE, SearchPaginator, install_triggers
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Кот <b>сидит</b> на окне', author=cls.author,
+            group=cls.group)
+        Post.objects.create(text='Кот спит, кот ест', author=cls.other)
+        Post.objects.create(text='Собака гуляет', author=cls.author)
+
+    def search(self, **params):
+        return Client().get(reverse('posts:search'), params)
+
+    def test_results_ranked_and_highlighted(self):
+        """Результаты по релевантности, совпадения подсвечены, HTML
+        из текста поста экранирован."""
+        response = self.search(q='кот')
+        posts = list(response.context['page_obj'])
+        self.assertEqual(
+            [post.text for post in posts],
+            ['Кот спит, кот ест', 'Кот <b>сидит</b> на окне'])
+        self.assertContains(response, '<mark>Кот</mark> спит')
+        self.assertContains(response, '&lt;b&gt;сидит&lt;/b&gt;')
+
+    def test_prefix_and_operators_in_input(self):
+        """Последнее слово ищется как префикс, операторы FTS5 из ввода
+        не разбираются."""
+        self.assertEqual(len(self.search(q='соба').context['page_obj']), 1)
+        response = self.search(q='кот" OR NEAR(')
+        self.assertEqual(response.status_code, 200)
+
+    def test_filters(self):
+        page = self.search(q='кот', group='test-slug').context['page_obj']
+        self.assertEqual([post.pk for post in page], [self.post.pk])
+        page = self.search(q='кот', author='other').context['page_obj']
+        self.assertEqual(len(page), 1)
+        self.assertEqual(
+            self.search(q='кот', author='nobody').status_code, 404)
+
+    def test_keyset_pages(self):
+        """Страницы по курсору покрывают все результаты без повторов."""
+        Post.objects.bulk_create(
+            Post(text=f'Кот номер {number}', author=self.author)
+            for number in range(5)
+        )
+        paginator = SearchPaginator('кот', 3)
+        seen = []
+        page = paginator.get_page()
+        while True:
+            seen.extend(post.pk for post in page)
+            if not page.has_next():
+                break
+            page = paginator.get_page(after=page.next_cursor)
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+    def test_index_follows_updates_and_deletes(self):
+        Post.objects.filter(pk=self.post.pk).update(text='Попугай')
+        self.assertEqual(len(SearchPaginator('попугай', 10).get_page()), 1)
+        Post.objects.filter(pk=self.post.pk).delete()
+        self.assertEqual(len(SearchPaginator('попугай', 10).get_page()), 0)
+
+    def test_missing_triggers_restored(self):
+        """После пересоздания таблицы триггеры и индекс восстанавливаются."""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_insert')
+        Post.objects.create(text='Пропущенный хомяк', author=self.author)
+        self.assertEqual(len(SearchPaginator('хомяк', 10).get_page()), 0)
+        install_triggers()
+        self.assertEqual(len(SearchPaginator('хомяк', 10).get_page()), 1)
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        client = Client()
+        client.force_login(admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'собака'})
+        self.assertContains(response, 'Собака гуляет')
+        self.assertNotContains(response, 'Кот спит')
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertIn(FTS_TABLE, sql)
+        self.assertNotIn('LIKE', sql)
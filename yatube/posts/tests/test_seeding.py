@@ -0,0 +1,102 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+
+from .. import counters, seeding, urls
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class SeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.created = seeding.seed(
+            users=30, groups=3, posts=200, comments=300, follows=5,
+            image_share=0.5,
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_created_rows(self):
+        """seed возвращает число добавленных строк каждой таблицы."""
+        self.assertEqual(self.created['users'], User.objects.count())
+        self.assertEqual(self.created['groups'], Group.objects.count())
+        self.assertEqual(self.created['posts'], Post.objects.count())
+        self.assertEqual(self.created['comments'], Comment.objects.count())
+        self.assertEqual(self.created['follows'], Follow.objects.count())
+
+    def test_power_law_authors(self):
+        """Самый плодовитый автор пишет заметную долю всех постов."""
+        top = Post.objects.values('author').annotate(
+            total=Count('pk')).order_by('-total').first()
+        self.assertGreater(top['total'], Post.objects.count() / 10)
+
+    def test_derived_data_consistent(self):
+        """Счётчики, ленты и метаданные картинок заполнены после вставки
+        в обход сигналов."""
+        self.assertEqual(counters.reconcile_users(), 0)
+        self.assertEqual(counters.reconcile_posts(), 0)
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        expected = sum(
+            Post.objects.filter(author_id=author_id).count()
+            for author_id in Follow.objects.values_list(
+                'author_id', flat=True)
+        )
+        self.assertEqual(TimelineEntry.objects.count(), expected)
+        with_image = Post.objects.exclude(image='')
+        self.assertTrue(with_image.exists())
+        self.assertFalse(with_image.filter(image_width=None).exists())
+        self.assertTrue(Post.objects.filter(image='').exists())
+
+
+class BenchViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        with override_settings(MEDIA_ROOT=cls.media_root):
+            seeding.seed(
+                users=10, groups=2, posts=30, comments=30, follows=3,
+                image_share=0,
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def test_report_covers_every_url(self):
+        """Отчёт в JSON есть для каждого URL из posts/urls.py."""
+        stdout = StringIO()
+        call_command(
+            'bench_views', existing=True, repeat=3, warmup=0, stdout=stdout)
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(
+            {view['view'] for view in report['views']},
+            {f'posts:{pattern.name}' for pattern in urls.urlpatterns},
+        )
+        for view in report['views']:
+            with self.subTest(view=view['view'], method=view['method']):
+                self.assertLess(view['status'], 400)
+                self.assertLessEqual(view['p50_ms'], view['p99_ms'])
+                self.assertGreater(view['allocated_kib'], 0)
+
+    def test_cold_rejected_on_live_cache(self):
+        """--cold не очищает общий кэш сайта при --existing."""
+        cache.set('live', 1)
+        with self.assertRaises(CommandError):
+            call_command('bench_views', existing=True, cold=True)
+        self.assertEqual(cache.get('live'), 1)
@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+
+from .. import storage
+from ..models import Post
+from ..storage import SHARDED_NAME
+from .utils import SMALL_GIF, uploaded_gif
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+OTHER_GIF = SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\x00\xFF\x00')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ContentAddressedStorageTests(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, image):
+        return Post.objects.create(
+            text='Пост', author=self.author, image=image)
+
+    def test_same_content_stored_once(self):
+        """Одинаковые загрузки лежат в одном файле в каталоге по хешу."""
+        first = self.create_post(uploaded_gif('first.gif'))
+        second = self.create_post(uploaded_gif('second.gif'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, SHARDED_NAME)
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(os.listdir(directory), [
+            os.path.basename(first.image.name)])
+
+    def test_file_deleted_with_last_reference(self):
+        first = self.create_post(uploaded_gif('first.gif'))
+        second = self.create_post(uploaded_gif('second.gif'))
+        path = first.image.path
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_release_rechecks_under_lock(self):
+        """Ссылки на файл проверяются и файл удаляется в одной
+        транзакции, а выбор файла при сохранении поста идёт в транзакции
+        записи поста."""
+        in_transaction = []
+        store_by_content = storage.store_by_content
+
+        def record(*args):
+            in_transaction.append(connection.in_atomic_block)
+
+        def store(post):
+            record()
+            store_by_content(post)
+
+        with mock.patch.object(storage, 'store_by_content', store):
+            post = self.create_post(uploaded_gif())
+        with mock.patch.object(
+                storage, 'delete_with_thumbnails', side_effect=record):
+            post.delete()
+        self.assertEqual(in_transaction, [True, True])
+
+    def test_replaced_image_released(self):
+        post = self.create_post(uploaded_gif())
+        path = post.image.path
+        post.image = uploaded_gif('other.gif', OTHER_GIF)
+        post.save()
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(post.image.path))
+
+    def test_legacy_files_not_deleted(self):
+        """Старые файлы из общего каталога удаление поста не трогает."""
+        name = default_storage.save('posts/legacy.gif', ContentFile(SMALL_GIF))
+        self.create_post(name).delete()
+        self.assertTrue(default_storage.exists(name))
+
+    def test_shard_images_command(self):
+        """Команда переносит старые файлы и переключает на них посты."""
+        legacy = [
+            default_storage.save(f'posts/legacy-{number}.gif',
+                                 ContentFile(SMALL_GIF))
+            for number in range(2)
+        ]
+        posts = [self.create_post(name) for name in legacy * 2]
+        out = StringIO()
+        call_command('shard_images', batch_size=1, stdout=out)
+        self.assertIn('Перенесено файлов: 2, ошибок: 0', out.getvalue())
+        names = set()
+        for post in posts:
+            post.refresh_from_db()
+            self.assertRegex(post.image.name, SHARDED_NAME)
+            names.add(post.image.name)
+        self.assertEqual(len(names), 1)
+        for name in legacy:
+            self.assertFalse(default_storage.exists(name))
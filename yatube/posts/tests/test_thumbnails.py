@@ -0,0 +1,209 @@
+import shutil
+import tempfile
+import threading
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image, features
+
+from .. import thumbnails
+from ..models import Post
+from ..thumbnails import (
+    BackgroundThumbnailBackend, card_variants, generate, image_formats,
+    resolve_thumbnails, schedule_post,
+)
+from .utils import uploaded_gif
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+GEOMETRY = settings.POST_CARD_GEOMETRY
+OPTIONS = settings.POST_CARD_OPTIONS
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class BackgroundThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой', author=cls.author, image=uploaded_gif())
+        cls.url = reverse('posts:post_detail', kwargs={'post_id': cls.post.pk})
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_placeholder_until_thumbnail_ready(self):
+        """Пока миниатюры нет, страница не трогает Pillow и ставит задачу."""
+        with mock.patch('posts.thumbnails.schedule') as schedule, \
+                mock.patch('sorl.thumbnail.default.engine') as engine:
+            response = Client().get(self.url)
+        engine.get_image.assert_not_called()
+        schedule.assert_called_once_with(
+            self.post.image.name, [(GEOMETRY, OPTIONS)])
+        self.assertContains(response, 'Картинка готовится')
+
+    def test_generated_thumbnail_replaces_placeholder(self):
+        edited = self.post.edited
+        generate(self.post.image.name, card_variants())
+        response = Client().get(self.url)
+        self.assertNotContains(response, 'Картинка готовится')
+        self.assertContains(response, '<img class="card-img')
+        self.post.refresh_from_db()
+        self.assertGreater(self.post.edited, edited)
+
+    def test_feed_reads_thumbnails_in_one_query(self):
+        """Миниатюры всей страницы ленты читаются одним запросом к kvstore."""
+        for number in range(3):
+            post = Post.objects.create(
+                text=f'Ещё пост {number}', author=self.author,
+                image=uploaded_gif(f'feed-{number}.gif'))
+            generate(post.image.name, card_variants())
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().get(reverse('posts:index'))
+        kvstore_queries = [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        # Картинки одинаковые и лежат в одном файле, поэтому готова
+        # миниатюра и у поста из setUpClass.
+        self.assertContains(response, '<img class="card-img', count=4)
+
+    def test_card_lists_every_variant_in_srcset(self):
+        """Карточка большой картинки получает srcset по всем ширинам
+        каждого формата."""
+        buffer = BytesIO()
+        Image.new('RGB', (1600, 900)).save(buffer, 'PNG')
+        post = Post.objects.create(
+            text='Большая картинка', author=self.author,
+            image=SimpleUploadedFile('large.png', buffer.getvalue()))
+        generate(post.image.name, card_variants())
+        card = resolve_thumbnails([post])[post.pk]
+        self.assertEqual(
+            [mime for mime, _ in card.sources],
+            [f'image/{format_.lower()}' for format_ in image_formats()],
+        )
+        for _, srcset in card.sources:
+            self.assertEqual(
+                [entry.rsplit(' ', 1)[1] for entry in srcset.split(', ')],
+                [f'{width}w' for width in settings.POST_IMAGE_WIDTHS],
+            )
+        self.assertEqual((card.x, card.y), (960, 339))
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'srcset=')
+
+    def test_small_image_not_upscaled_in_srcset(self):
+        """В srcset маленькой картинки нет растянутых копий."""
+        generate(self.post.image.name, card_variants())
+        card = resolve_thumbnails([self.post])[self.post.pk]
+        for _, srcset in card.sources:
+            self.assertEqual(
+                [entry.rsplit(' ', 1)[1] for entry in srcset.split(', ')],
+                ['2w'],
+            )
+        self.assertEqual((card.x, card.y), (960, 339))
+
+    @skipUnless(features.check('webp'), 'Pillow собран без WebP')
+    def test_webp_variants(self):
+        generate(self.post.image.name, card_variants())
+        card = resolve_thumbnails([self.post])[self.post.pk]
+        self.assertEqual(card.sources[0][0], 'image/webp')
+
+    def test_upload_schedules_thumbnails(self):
+        """Загрузка картинки ставит миниатюры в очередь."""
+        with mock.patch('posts.views.schedule_post') as schedule_post:
+            self.author_client.post(reverse('posts:post_create'), data={
+                'text': 'Новый пост', 'image': uploaded_gif('new.gif')})
+        post = Post.objects.get(text='Новый пост')
+        schedule_post.assert_called_once_with(post)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class PregenerateCommandTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_command_generates_missing_thumbnails(self):
+        author = User.objects.create_user(username='author')
+        posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=author,
+                image=uploaded_gif(f'gif-{number}.gif'))
+            for number in range(3)
+        ]
+        call_command('pregenerate_thumbnails', workers=2, stdout=StringIO())
+        backend = BackgroundThumbnailBackend()
+        for post in posts:
+            with self.subTest(image=post.image.name):
+                self.assertIsNotNone(
+                    backend.get_ready(post.image, GEOMETRY, OPTIONS))
+
+    def test_default_workers_without_background_pool(self):
+        """Без фонового пула команда всё равно работает в один поток."""
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(
+            text='Пост', author=author, image=uploaded_gif('gif.gif'))
+        out = StringIO()
+        call_command('pregenerate_thumbnails', stdout=out)
+        self.assertIn(
+            'Картинок обработано: 1, ошибок: 0', out.getvalue())
+        self.assertIsNotNone(BackgroundThumbnailBackend().get_ready(
+            post.image, GEOMETRY, OPTIONS))
+        with self.assertRaises(CommandError):
+            call_command('pregenerate_thumbnails', workers=0)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=2)
+class ThumbnailPoolTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_pool_generates_variants(self):
+        """После коммита варианты картинки создаёт фоновый пул."""
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(
+            text='Пост', author=author, image=uploaded_gif('pool.gif'))
+        threads = set()
+
+        def run(key, in_pool=True):
+            threads.add(threading.current_thread().name)
+            run_job(key, in_pool)
+
+        run_job = thumbnails._run
+        with mock.patch.object(thumbnails, '_executor', None), \
+                mock.patch.object(thumbnails, '_run', run):
+            schedule_post(post)
+            thumbnails.executor().shutdown(wait=True)
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads.pop().startswith('thumbnails'))
+        variants = card_variants()
+        ready = BackgroundThumbnailBackend().get_ready_many(
+            [post.image.name], variants)
+        self.assertEqual(len(ready[post.image.name]), len(variants))
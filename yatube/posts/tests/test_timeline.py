@@ -0,0 +1,193 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import timeline
+from ..models import Follow, PopularAuthor, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def timeline_posts(self):
+        return [entry.post for entry in self.reader.timeline.all()]
+
+    def test_follow_backfills_timeline(self):
+        """Подписка добавляет в ленту уже опубликованные посты."""
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'author'}))
+        self.assertEqual(self.timeline_posts(), [self.old_post])
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост сразу попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(self.timeline_posts(), [post, self.old_post])
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.old_post])
+
+    def test_unfollow_and_delete_clean_timeline(self):
+        """Отписка и удаление поста убирают записи из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        post.delete()
+        self.assertEqual(self.timeline_posts(), [self.old_post])
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'author'}))
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_rebuild_command(self):
+        """Команда rebuild_timelines восстанавливает ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.bulk_create([
+            Post(text='Пост без сигналов', author=self.author)])
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(),
+            self.author.posts.count(),
+        )
+
+
+@override_settings(TIMELINE_FANOUT_THRESHOLD=2)
+class HybridTimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.star = User.objects.create_user(username='star')
+        cls.regular = User.objects.create_user(username='regular')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='other')
+        Follow.objects.create(user=cls.reader, author=cls.regular)
+        Follow.objects.create(user=cls.reader, author=cls.star)
+        Follow.objects.create(user=cls.other, author=cls.star)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        timeline.FEED_STATS.clear()
+
+    def create_posts(self):
+        return [
+            Post.objects.create(text=f'Пост {number}', author=author)
+            for number, author in enumerate(
+                (self.star, self.regular, self.star, self.regular))
+        ]
+
+    def test_popular_author_is_not_fanned_out(self):
+        """Посты популярного автора не пишутся в ленты подписчиков."""
+        self.assertTrue(
+            PopularAuthor.objects.filter(author=self.star).exists())
+        self.create_posts()
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.star).exists())
+        self.assertEqual(timeline.feed_stats()['fanout_skipped'], 2)
+
+    def test_feed_merges_pulled_posts(self):
+        """Лента подписок подмешивает посты популярного автора по дате."""
+        posts = self.create_posts()
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), posts[::-1])
+        stats = timeline.feed_stats()
+        self.assertEqual(stats['materialized'], 2)
+        self.assertEqual(stats['pulled'], 2)
+
+    @override_settings(POSTS_KEYSET_PAGINATION=True)
+    def test_keyset_walks_merged_feed(self):
+        """Курсорная пагинация проходит смешанную ленту без пропусков."""
+        posts = self.create_posts()
+        feed, _, keyset_class = timeline.follow_feed(self.reader)
+        paginator = keyset_class(feed, 3)
+        first = paginator.get_page()
+        second = paginator.get_page(after=first.next_cursor)
+        self.assertEqual(list(first) + list(second), posts[::-1])
+
+    def test_rebuild_skips_popular_authors(self):
+        """Пересборка не пишет в ленты посты популярных авторов."""
+        self.create_posts()
+        TimelineEntry.objects.all().delete()
+        timeline.rebuild()
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list('author_id', flat=True)),
+            {self.regular.pk},
+        )
+
+    def test_rebuild_is_atomic(self):
+        """Сбой пересборки оставляет ленты как были."""
+        self.create_posts()
+        with mock.patch.object(
+                timeline, '_materialize', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                timeline.rebuild()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+
+    def test_unpopular_author_is_backfilled(self):
+        """Потерявший популярность автор раскладывается по лентам в фоне,
+        а не в запросе отписки."""
+        posts = self.create_posts()
+        with mock.patch.object(timeline, 'schedule_release') as schedule:
+            Follow.objects.filter(user=self.other).delete()
+        schedule.assert_called_once_with(self.star.pk)
+        self.assertTrue(PopularAuthor.objects.exists())
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.star).exists())
+        self.assertTrue(timeline.release(self.star.pk))
+        self.assertFalse(PopularAuthor.objects.exists())
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user=self.reader, author=self.star).count(),
+            2,
+        )
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), posts[::-1])
+
+    def test_follow_popular_author_skips_backfill(self):
+        """Подписка на популярного автора не копирует его посты в ленту."""
+        self.create_posts()
+        newcomer = User.objects.create_user(username='newcomer')
+        Follow.objects.create(user=newcomer, author=self.star)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=newcomer).exists())
+
+    @override_settings(
+        TIMELINE_FANOUT_THRESHOLD=4, TIMELINE_FANOUT_HYSTERESIS=0.5)
+    def test_popularity_hysteresis(self):
+        """Между порогами автор не меняет способ раскладки."""
+        fans = [
+            User.objects.create_user(username=f'fan{number}')
+            for number in range(2)
+        ]
+        for fan in fans:
+            Follow.objects.create(user=fan, author=self.star)
+        self.assertTrue(
+            PopularAuthor.objects.filter(author=self.star).exists())
+        with mock.patch.object(timeline, 'schedule_release') as schedule:
+            Follow.objects.filter(user=fans[0]).delete()
+            Follow.objects.filter(user=fans[1]).delete()
+            self.assertFalse(timeline.release(self.star.pk))
+            schedule.assert_not_called()
+            Follow.objects.filter(user=self.other).delete()
+        schedule.assert_called_once_with(self.star.pk)
+        timeline.refresh_popularity()
+        self.assertFalse(PopularAuthor.objects.exists())
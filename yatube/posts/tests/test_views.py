@@ -18,7 +18,7 @@ POSTS_ON_FIRST_PAGE = 10
 POSTS_ON_SECOND_PAGE = 2
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -75,6 +75,9 @@ class PostPagesTests(TestCase):
         super().tearDownClass()
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
+    def setUp(self):
+        cache.clear()
+
     def test_pages_uses_correct_template(self):
         """URL-адрес использует соответствующий шаблон."""
         templates_pages_names = {
@@ -291,10 +294,49 @@ class PostPagesTests(TestCase):
     def test_cache(self):
         """Проверяем кэширование главной страницы"""
         response_1 = self.authorized_client.get(reverse('posts:index'))
-        post_1 = Post.objects.get(id=1)
-        post_1.delete()
+        Post.objects.filter(id=Post.objects.first().id).update(
+            text='Изменено мимо сигналов')
         response_2 = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response_1.content, response_2.content)
         cache.clear()
         response_3 = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(response_1.content, response_3.content)
+
+    def test_cache_invalidated_on_post_change(self):
+        """Проверяем, что новый и удалённый пост сразу сбрасывают кэш лент"""
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                self.guest_client.get(page)
+                post = Post.objects.create(
+                    text='Свежий пост',
+                    author=self.user,
+                    group=self.group,
+                )
+                self.assertContains(self.guest_client.get(page), 'Свежий пост')
+                post.delete()
+                self.assertNotContains(
+                    self.guest_client.get(page), 'Свежий пост')
+
+    def test_cache_kept_for_other_feeds(self):
+        """Проверяем, что пост в одной группе не сбрасывает кэш другой"""
+        page = reverse('posts:group_list', kwargs={'slug': 'fake-slug'})
+        response_1 = self.guest_client.get(page)
+        Post.objects.create(
+            text='Свежий пост',
+            author=self.user,
+            group=self.group,
+        )
+        Group.objects.filter(slug='fake-slug').update(title='Не видно')
+        response_2 = self.guest_client.get(page)
+        self.assertEqual(
+            self.feed_section(response_1), self.feed_section(response_2))
+
+    @staticmethod
+    def feed_section(response):
+        content = response.content.decode()
+        return content.split('</p>', 1)[1].split('<footer', 1)[0]
@@ -0,0 +1,313 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import (
+    DummyImageFile, ImageFile, deserialize_image_file,
+)
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE, KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core import metrics
+
+from . import cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp', 'PNG': 'image/png'}
+CARD_IMAGE_SIZES = '(max-width: 960px) 100vw, 960px'
+
+_executor = None
+_executor_pid = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def image_formats():
+    """Форматы из POST_IMAGE_FORMATS, которые умеет кодировать Pillow."""
+    return [
+        format_ for format_ in settings.POST_IMAGE_FORMATS
+        if format_ != 'WEBP' or features.check('webp')
+    ]
+
+
+def _main_variant():
+    """Вариант для <img> карточки: тот же, что у тега thumbnail."""
+    return (
+        settings.POST_CARD_GEOMETRY,
+        dict(settings.POST_CARD_OPTIONS, format='JPEG'),
+    )
+
+
+def card_variants():
+    """(geometry, options) всех вариантов картинки карточки.
+
+    Варианты повторяют пропорции POST_CARD_GEOMETRY для каждой ширины
+    из POST_IMAGE_WIDTHS и каждого формата. Увеличивать маленькую
+    картинку можно только основному варианту: остальные не шире
+    исходной, иначе srcset отдавал бы растянутые копии.
+    """
+    width, height = map(int, settings.POST_CARD_GEOMETRY.split('x'))
+    main = _main_variant()
+    variants = []
+    for format_ in image_formats():
+        for variant_width in settings.POST_IMAGE_WIDTHS:
+            geometry = (
+                f'{variant_width}x{round(variant_width * height / width)}')
+            options = {**settings.POST_CARD_OPTIONS, 'format': format_}
+            if (geometry, options) != main:
+                options['upscale'] = False
+            variants.append((geometry, options))
+    return variants
+
+
+def _job_key(name, variants):
+    return name, tuple(
+        (geometry, tuple(sorted(options.items())))
+        for geometry, options in variants
+    )
+
+
+def executor():
+    """Пул потоков текущего процесса; после fork создаётся заново."""
+    global _executor, _executor_pid
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+            _executor_pid = os.getpid()
+            _pending.clear()
+        return _executor
+
+
+class GeneratingBackend(ThumbnailBackend):
+    """Бэкенд фонового пула: считает созданные миниатюры."""
+
+    def _create_thumbnail(self, source_image, geometry_string, options,
+                          thumbnail):
+        super()._create_thumbnail(
+            source_image, geometry_string, options, thumbnail)
+        metrics.THUMBNAILS_GENERATED.inc(format=options['format'])
+
+
+def generate(name, variants):
+    """Создаёт варианты картинки и сбрасывает кэши постов с ней."""
+    backend = GeneratingBackend()
+    for geometry, options in variants:
+        backend.get_thumbnail(name, geometry, **options)
+    cache.touch_posts(Post.objects.filter(image=name))
+
+
+def _run(key, in_pool=True):
+    name, variants = key
+    try:
+        generate(name, [
+            (geometry, dict(options)) for geometry, options in variants])
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', name)
+    finally:
+        with _lock:
+            _pending.discard(key)
+        if in_pool:
+            connection.close()
+
+
+def schedule(name, variants):
+    """Ставит варианты картинки в очередь пула после коммита транзакции.
+
+    При THUMBNAIL_WORKERS = 0 варианты создаются сразу после коммита
+    в том же потоке.
+    """
+    key = _job_key(name, variants)
+
+    def submit():
+        if not settings.THUMBNAIL_WORKERS:
+            _run(key, in_pool=False)
+            return
+        pool = executor()
+        with _lock:
+            if key in _pending:
+                return
+            _pending.add(key)
+        pool.submit(_run, key)
+
+    transaction.on_commit(submit)
+
+
+def schedule_post(post):
+    """Все варианты картинки поста для карточек и srcset."""
+    if post.image:
+        schedule(post.image.name, card_variants())
+
+
+class BackgroundThumbnailBackend(ThumbnailBackend):
+    """Отдаёт только готовые миниатюры, остальные ставит в очередь.
+
+    Пока миниатюры нет в kvstore, возвращается DummyImageFile, и тег
+    thumbnail рисует ветку {% empty %} вместо работы с Pillow.
+    """
+
+    def _normalize_options(self, source, options):
+        # Тот же порядок, что в ThumbnailBackend.get_thumbnail: от
+        # набора опций зависит имя файла миниатюры.
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
+
+    def thumbnail_file(self, file_, geometry_string, options):
+        """ImageFile миниатюры, под которым она лежит в kvstore."""
+        source = ImageFile(file_)
+        name = self._get_thumbnail_filename(
+            source, geometry_string,
+            self._normalize_options(source, dict(options)),
+        )
+        return ImageFile(name, default.storage)
+
+    def get_ready(self, file_, geometry_string, options):
+        """Готовая миниатюра из kvstore или None."""
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, options))
+
+    def get_ready_many(self, files, variants):
+        """Готовые варианты картинок одним обращением к kvstore.
+
+        Возвращает {имя картинки: {номер варианта: миниатюра}}.
+        """
+        thumbnails = {
+            (ImageFile(file_).name, index): self.thumbnail_file(
+                file_, geometry, options)
+            for file_ in files
+            for index, (geometry, options) in enumerate(variants)
+        }
+        ready = default.kvstore.get_many(thumbnails.values())
+        found = {ImageFile(file_).name: {} for file_ in files}
+        for (name, index), thumbnail in thumbnails.items():
+            if thumbnail.key in ready:
+                found[name][index] = ready[thumbnail.key]
+        return found
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        cached = self.get_ready(file_, geometry_string, options)
+        if cached:
+            return cached
+        schedule(ImageFile(file_).name, [(geometry_string, options)])
+        return DummyImageFile(geometry_string)
+
+
+class BatchKVStore(KVStore):
+    """cached_db kvstore с выборкой нескольких миниатюр за раз."""
+
+    def get_many(self, image_files):
+        """{ключ: ImageFile} одним get_many кэша и одним запросом к БД
+        для промахов кэша.
+        """
+        raw_keys = {
+            add_prefix(image_file.key): image_file.key
+            for image_file in image_files
+        }
+        values = self.cache.get_many(list(raw_keys))
+        missing = [key for key in raw_keys if key not in values]
+        if missing:
+            stored = dict(
+                KVStoreModel.objects.filter(key__in=missing)
+                .values_list('key', 'value')
+            )
+            fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(
+                fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(fetched)
+        return {
+            raw_keys[key]: deserialize_image_file(value)
+            for key, value in values.items() if value != EMPTY_VALUE
+        }
+
+
+class CardImage:
+    """Картинка карточки: основной вариант для <img> и srcset по форматам."""
+    sizes = CARD_IMAGE_SIZES
+
+    def __init__(self, image, sources):
+        self.image = image
+        self.sources = sources
+
+    @property
+    def url(self):
+        return self.image.url
+
+    @property
+    def x(self):
+        return self.image.x
+
+    @property
+    def y(self):
+        return self.image.y
+
+
+def _card_image(variants, ready, source_width):
+    main = _main_variant()
+    sources = {}
+    image = None
+    for index, variant in enumerate(variants):
+        thumbnail = ready.get(index)
+        if thumbnail is None:
+            continue
+        if variant == main:
+            image = thumbnail
+        # В srcset не попадают увеличенный основной вариант и варианты,
+        # которые без увеличения вышли одной ширины.
+        if source_width and thumbnail.x > source_width:
+            continue
+        sources.setdefault(variant[1]['format'], {}).setdefault(
+            thumbnail.x, f'{thumbnail.url} {thumbnail.x}w')
+    if image is None:
+        return None
+    return CardImage(image, [
+        (MIME_TYPES[format_], ', '.join(srcset.values()))
+        for format_, srcset in sources.items()
+    ])
+
+
+def resolve_thumbnails(posts):
+    """Картинки карточек страницы одним обращением к kvstore.
+
+    Возвращает {pk поста: CardImage}; недостающие варианты ставятся
+    в очередь.
+    """
+    images = {post.pk: post.image.name for post in posts if post.image}
+    widths = {post.pk: post.image_width for post in posts}
+    if not images:
+        return {}
+    variants = card_variants()
+    ready = default.backend.get_ready_many(set(images.values()), variants)
+    for name, found in ready.items():
+        if len(found) < len(variants):
+            schedule(name, [
+                variant for index, variant in enumerate(variants)
+                if index not in found
+            ])
+    cards = {}
+    for post_id, name in images.items():
+        card = _card_image(variants, ready[name], widths[post_id])
+        if card is not None:
+            cards[post_id] = card
+    return cards
@@ -0,0 +1,320 @@
+import heapq
+import logging
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.db.models import Count
+
+from .models import Follow, PopularAuthor, Post, TimelineEntry
+from .paginators import KeysetPaginator, seek_condition
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+TIMELINE_KEYSET_ORDERING = ('-pub_date', '-post_id')
+FEED_FIELDS = (('pub_date', True), ('post_id', True))
+POST_FIELDS = (('pub_date', True), ('id', True))
+
+# Сколько постов лента отдала из материализованных записей (materialized),
+# сколько подмешала при чтении (pulled) и сколько раз fan-out пропущен
+# для популярных авторов (fanout_skipped).
+FEED_STATS = Counter()
+
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+
+
+def feed_stats():
+    return dict(FEED_STATS)
+
+
+def fan_out(post):
+    """Кладёт новый пост в ленты всех подписчиков автора."""
+    if PopularAuthor.objects.filter(author_id=post.author_id).exists():
+        FEED_STATS['fanout_skipped'] += 1
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    posts = Post.objects.filter(
+        author_id=author_id).values_list('pk', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def drop(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def release_threshold():
+    """Число подписчиков, ниже которого автор перестаёт быть популярным."""
+    return (
+        settings.TIMELINE_FANOUT_THRESHOLD
+        * settings.TIMELINE_FANOUT_HYSTERESIS
+    )
+
+
+def update_popularity(author_id):
+    """Переводит автора между раскладкой при записи и подмешиванием
+    при чтении, когда число подписчиков пересекает порог.
+
+    Возвращает True, если посты автора пока подмешиваются при чтении.
+    Раскладка по лентам всех подписчиков долгая, поэтому она идёт в
+    фоне после коммита (release), а до её конца автор остаётся
+    популярным.
+    """
+    followers = Follow.objects.filter(author_id=author_id).count()
+    if followers >= settings.TIMELINE_FANOUT_THRESHOLD:
+        PopularAuthor.objects.get_or_create(author_id=author_id)
+        return True
+    if not PopularAuthor.objects.filter(author_id=author_id).exists():
+        return False
+    if followers < release_threshold():
+        schedule_release(author_id)
+    return True
+
+
+def release(author_id):
+    """Раскладывает посты потерявшего популярность автора по лентам.
+
+    Снятие популярности и заполнение лент идут в одной транзакции:
+    читатели сразу переходят с подмешивания на готовые записи.
+    """
+    with transaction.atomic():
+        followers = Follow.objects.filter(author_id=author_id).count()
+        if followers >= release_threshold():
+            return False
+        deleted, _ = PopularAuthor.objects.filter(
+            author_id=author_id).delete()
+        if deleted:
+            _materialize(Follow.objects.filter(author_id=author_id))
+    return bool(deleted)
+
+
+def executor():
+    """Пул из одного потока для release; после fork создаётся заново."""
+    global _executor, _executor_pid
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='timeline')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _run_release(author_id):
+    try:
+        release(author_id)
+    except Exception:
+        logger.exception('Не удалось разложить посты автора %s', author_id)
+    finally:
+        connection.close()
+
+
+def schedule_release(author_id):
+    transaction.on_commit(
+        lambda: executor().submit(_run_release, author_id))
+
+
+def refresh_popularity():
+    followers = (
+        Follow.objects.values('author_id')
+        .annotate(followers=Count('id'))
+        .filter(followers__gte=release_threshold())
+        .values_list('author_id', 'followers')
+    )
+    known = set(PopularAuthor.objects.values_list('author_id', flat=True))
+    popular = {
+        author_id for author_id, count in followers
+        if count >= settings.TIMELINE_FANOUT_THRESHOLD or author_id in known
+    }
+    PopularAuthor.objects.exclude(author_id__in=popular).delete()
+    PopularAuthor.objects.bulk_create(
+        PopularAuthor(author_id=author_id) for author_id in popular - known)
+
+
+def rebuild(users=None):
+    """Пересобирает ленты с нуля по текущим подпискам.
+
+    Удаление и заполнение идут в одной транзакции: пока лента
+    пересобирается, читатели видят старую.
+    """
+    entries = TimelineEntry.objects.all()
+    follows = Follow.objects.all()
+    if users is not None:
+        entries = entries.filter(user__in=users)
+        follows = follows.filter(user__in=users)
+    with transaction.atomic():
+        if users is None:
+            refresh_popularity()
+        entries.delete()
+        _materialize(follows)
+    return follows.count()
+
+
+def _materialize(follows):
+    """Записи лент по подпискам из queryset одним INSERT … SELECT.
+
+    Посты популярных авторов подмешиваются при чтении и в ленты не
+    пишутся.
+    """
+    follows = follows.exclude(
+        author_id__in=PopularAuthor.objects.values('author_id'))
+    pairs, params = follows.values(
+        'user_id', 'author_id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            f'(user_id, post_id, author_id, pub_date) '
+            f'SELECT follow.user_id, post.id, post.author_id, post.pub_date '
+            f'FROM ({pairs}) AS follow '
+            f'JOIN {Post._meta.db_table} AS post '
+            f'ON post.author_id = follow.author_id '
+            # Без WHERE SQLite примет ON CONFLICT за условие JOIN.
+            f'WHERE true ON CONFLICT DO NOTHING',
+            params,
+        )
+
+
+def timeline_for(user):
+    return TimelineEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group')
+
+
+def follow_feed(user):
+    """Лента подписок и классы пагинаторов для неё.
+
+    Если пользователь не подписан на популярных авторов, лента целиком
+    читается из материализованных записей.
+    """
+    popular = list(
+        PopularAuthor.objects.filter(
+            author__following__user=user).values_list('author_id', flat=True)
+    )
+    if not popular:
+        return timeline_for(user), TimelinePaginator, TimelineKeysetPaginator
+    return HybridTimeline(user, popular), Paginator, HybridKeysetPaginator
+
+
+class HybridTimeline:
+    """Лента из материализованных записей и постов популярных авторов.
+
+    Каждый источник уже отсортирован по (pub_date, id), поэтому окно
+    ленты собирается k-way слиянием без общей сортировки.
+    """
+    model = Post
+    ordered = True
+
+    def __init__(self, user, popular_ids):
+        self.popular_ids = popular_ids
+        self.materialized = TimelineEntry.objects.filter(
+            user=user).exclude(author_id__in=popular_ids)
+
+    def count(self):
+        return (
+            self.materialized.count()
+            + Post.objects.filter(author_id__in=self.popular_ids).count()
+        )
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        return self._load(self.merge(None, True, key.stop)[start:])
+
+    def fetch(self, values, forward, limit):
+        return self._load(self.merge(values, forward, limit))
+
+    def merge(self, values, forward, limit):
+        streams = [self._stream(
+            self.materialized, FEED_FIELDS, values, forward, limit,
+            'materialized',
+        )]
+        streams.extend(
+            self._stream(
+                Post.objects.filter(author_id=author_id), POST_FIELDS,
+                values, forward, limit, 'pulled',
+            )
+            for author_id in self.popular_ids
+        )
+        return list(islice(heapq.merge(*streams, reverse=forward), limit))
+
+    @staticmethod
+    def _stream(queryset, fields, values, forward, limit, source):
+        names = [name for name, _ in fields]
+        if forward:
+            ordering = [f'-{name}' for name in names]
+        else:
+            ordering = names
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(
+                seek_condition(fields, values, forward))
+        for pub_date, post_id in queryset.values_list(*names)[:limit]:
+            yield pub_date, post_id, source
+
+    @staticmethod
+    def _load(rows):
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [post_id for _, post_id, _ in rows])
+        FEED_STATS.update(source for _, _, source in rows)
+        return [posts[post_id] for _, post_id, _ in rows if post_id in posts]
+
+
+class TimelinePageMixin:
+    """Отдаёт в шаблон посты вместо записей ленты."""
+
+    def _get_page(self, object_list, *args, **kwargs):
+        posts = [entry.post for entry in object_list]
+        FEED_STATS['materialized'] += len(posts)
+        return super()._get_page(posts, *args, **kwargs)
+
+
+class TimelinePaginator(TimelinePageMixin, Paginator):
+    pass
+
+
+class TimelineKeysetPaginator(TimelinePageMixin, KeysetPaginator):
+    def __init__(self, object_list, per_page,
+                 ordering=TIMELINE_KEYSET_ORDERING):
+        super().__init__(object_list, per_page, ordering)
+
+
+class HybridKeysetPaginator(KeysetPaginator):
+    def _fetch(self, values, forward, limit):
+        return self.object_list.fetch(values, forward, limit)
@@ -1,42 +1,104 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+
+from core.query_budget import query_budget
 
+from .autocomplete import GROUPS, USERS, autocomplete as name_index
+from .cache import anonymous_page_cache, feed_name, feed_version
+from .conditional import (
+    conditional_page, follow_state, group_state, index_state, post_state,
+    profile_state,
+)
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
+from .models import Comment, Group, Post, User, Follow
+from .paginators import KeysetPaginator
+from .search import SearchPaginator
+from .thumbnails import schedule_post
+from .timeline import follow_feed
 
 NUMBER_OF_POSTS = 10
+NUMBER_OF_COMMENTS = 20
+COMMENT_ORDERINGS = {
+    'old': ('created', 'id'),
+    'new': ('-created', '-id'),
+}
 
 
-def paginate_posts(request, post_list):
-    paginator = Paginator(post_list, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+def paginate_posts(request, post_list, paginator_class=Paginator,
+                   keyset_class=KeysetPaginator):
+    if settings.POSTS_KEYSET_PAGINATION:
+        paginator = keyset_class(post_list, NUMBER_OF_POSTS)
+        page_obj = paginator.get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    else:
+        paginator = paginator_class(post_list, NUMBER_OF_POSTS)
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
     context = {
         'page_obj': page_obj,
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
     }
     return context
 
 
+def paginate_comments(request, post_id):
+    """Страница комментариев по курсору: от старых (old) или новых (new)."""
+    order = request.GET.get('order')
+    if order not in COMMENT_ORDERINGS:
+        order = 'old'
+    paginator = KeysetPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        NUMBER_OF_COMMENTS,
+        ordering=COMMENT_ORDERINGS[order],
+    )
+    return {
+        'comments': paginator.get_page(after=request.GET.get('after')),
+        'comments_order': order,
+        'post_id': post_id,
+    }
+
+
+@query_budget(5)
+@conditional_page(index_state)
+@anonymous_page_cache
 def index(request):
     post_list = Post.objects.select_related('author', 'group')
     context = paginate_posts(request, post_list)
+    context['feed_version'] = feed_version(feed_name('index'))
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(6)
+@conditional_page(group_state)
+@anonymous_page_cache
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     post_list = group.posts.select_related('author', 'group')
     context = paginate_posts(request, post_list)
     context['group'] = group
+    context['feed_version'] = feed_version(feed_name('group', group.pk))
     return render(request, 'posts/group_list.html', context)
 
 
+@query_budget(7)
+@conditional_page(profile_state)
+@anonymous_page_cache
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username)
     post_list = author.posts.select_related('author', 'group')
     context = paginate_posts(request, post_list)
     context['author'] = author
+    context['feed_version'] = feed_version(feed_name('profile', author.pk))
     following = request.user.is_authenticated and Follow.objects.filter(
         author=author,
         user=request.user,
@@ -47,19 +109,30 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(5)
+@conditional_page(post_state)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'), pk=post_id)
     form = CommentForm(None)
-    comments = post.comments.all()
-    context = {
+    context = paginate_comments(request, post.pk)
+    context.update({
         'post': post,
         'form': form,
-        'comments': comments,
-    }
+    })
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(1)
+def post_comments(request, post_id):
+    """Следующая порция комментариев без остальной страницы поста."""
+    context = paginate_comments(request, post_id)
+    return render(request, 'includes/comments.html', context)
+
+
+@query_budget(11)
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -70,10 +143,12 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        schedule_post(post)
         return redirect('posts:profile', post.author.username)
     return render(request, 'posts/create_post.html', {"form": form}, context)
 
 
+@query_budget(6)
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
@@ -86,6 +161,8 @@ def post_edit(request, post_id):
         return redirect('posts:post_detail', post.pk)
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            schedule_post(post)
         return redirect('posts:post_detail', post.id)
     context = {
         'post': post,
@@ -96,7 +173,9 @@ def post_edit(request, post_id):
         request, 'posts/create_post.html', context)
 
 
+@query_budget(7)
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -108,14 +187,23 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(7)
 @login_required
+@conditional_page(follow_state)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    context = paginate_posts(request, posts)
+    post_list, paginator_class, keyset_class = follow_feed(request.user)
+    context = paginate_posts(
+        request,
+        post_list,
+        paginator_class=paginator_class,
+        keyset_class=keyset_class,
+    )
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(15)
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
@@ -123,8 +211,67 @@ def profile_follow(request, username):
     return redirect('posts:profile', username)
 
 
+@query_budget(12)
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username)
+
+
+@query_budget(6)
+def search(request):
+    """Поиск по тексту постов, по желанию в группе или у автора."""
+    query = request.GET.get('q', '').strip()
+    slug = request.GET.get('group')
+    username = request.GET.get('author')
+    group = get_object_or_404(Group, slug=slug) if slug else None
+    author = get_object_or_404(User, username=username) if username else None
+    paginator = SearchPaginator(
+        query,
+        NUMBER_OF_POSTS,
+        group_id=group.pk if group else None,
+        author_id=author.pk if author else None,
+    )
+    params = {'q': query, 'group': slug, 'author': username}
+    context = {
+        'query': query,
+        'group': group,
+        'search_author': author,
+        'search_params': urlencode(
+            {name: value for name, value in params.items() if value}),
+        'page_obj': paginator.get_page(after=request.GET.get('after')),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@query_budget(2)
+def autocomplete(request):
+    """Имена пользователей и группы по началу имени, названия или slug.
+
+    Отвечает из индекса в памяти процесса; к базе обращается только
+    первый запрос, который этот индекс строит.
+    """
+    kind = request.GET.get('kind')
+    kinds = (kind,) if kind in (USERS, GROUPS) else (USERS, GROUPS)
+    found = name_index.search(request.GET.get('q', ''), kinds)
+    results = {}
+    if USERS in found:
+        results[USERS] = [
+            {
+                'username': username,
+                'url': reverse('posts:profile', args=(username,)),
+            }
+            for username in found[USERS]
+        ]
+    if GROUPS in found:
+        results[GROUPS] = [
+            {
+                'title': title,
+                'slug': slug,
+                'url': reverse('posts:group_list', args=(slug,)),
+            }
+            for title, slug in found[GROUPS]
+        ]
+    return JsonResponse(results)
@@ -34,11 +34,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.flight_recorder.FlightRecorderMiddleware',
+    'core.metrics.MetricsMiddleware',
+    'core.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.query_budget.QueryBudgetMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -48,7 +52,7 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.timed.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -68,11 +72,30 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db_backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живёт между запросами потока, а не открывается
+        # заново на каждый.
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# PRAGMA для каждого соединения SQLite (core.database.apply_pragmas).
+# WAL: читатели не ждут писателя; synchronous=NORMAL в WAL не теряет
+# целостность, только последние транзакции при сбое питания. Писатель
+# ждёт блокировку до busy_timeout мс, а не падает с «database is
+# locked». cache_size < 0 — в КиБ на соединение.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+# Режим транзакций atomic(): IMMEDIATE сразу берёт блокировку записи.
+SQLITE_TRANSACTION_MODE = 'IMMEDIATE'
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -116,12 +139,77 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кэш в файле SQLite общий для всех процессов WSGI-сервера, поэтому
+# страницы рисуются один раз, а сброс версий доходит до всех воркеров.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
     }
 }
 
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Курсорная пагинация лент по (pub_date, id) вместо номеров страниц.
+POSTS_KEYSET_PAGINATION = False
+
+# С какого числа подписчиков посты автора не раскладываются по лентам
+# при публикации, а подмешиваются в ленту подписок при чтении.
+TIMELINE_FANOUT_THRESHOLD = 10000
+# Популярность снимается, только когда подписчиков меньше
+# TIMELINE_FANOUT_THRESHOLD * TIMELINE_FANOUT_HYSTERESIS: автор у порога
+# не переключается туда-обратно на каждой подписке.
+TIMELINE_FANOUT_HYSTERESIS = 0.8
+
+# Фрагменты лент сбрасываются сигналами при изменении постов и групп,
+# поэтому время жизни может быть долгим.
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Отрисованные карточки постов; ключ меняется вместе с постом.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Кэш целых страниц лент для гостей: сколько секунд копия считается
+# свежей, сколько хранится для отдачи устаревшей копии во время
+# пересборки, время жизни блокировки пересборки и сколько секунд
+# запрос без копии ждёт чужой пересборки.
+PAGE_CACHE_FRESH = 60 * 5
+PAGE_CACHE_TIMEOUT = 60 * 60
+PAGE_CACHE_LOCK_TIMEOUT = 30
+PAGE_CACHE_WAIT = 2
+
+# Миниатюры готовятся в фоновом пуле потоков, а не при первой отрисовке.
+THUMBNAIL_BACKEND = 'posts.thumbnails.BackgroundThumbnailBackend'
+# kvstore sorl с пакетной выборкой миниатюр для страницы ленты.
+THUMBNAIL_KVSTORE = 'posts.thumbnails.BatchKVStore'
+# Потоков фонового пула миниатюр. 0 — миниатюры создаются сразу после
+# коммита в потоке запроса, так работают тесты (yatube/test_settings.py).
+THUMBNAIL_WORKERS = 2
+# Картинка карточки поста и её варианты для srcset: каждая ширина
+# в каждом формате. WebP пропускается, если Pillow собран без него.
+# upscale действует только на основной вариант POST_CARD_GEOMETRY:
+# варианты srcset не шире исходной картинки.
+POST_CARD_GEOMETRY = '960x339'
+POST_CARD_OPTIONS = {'crop': 'top', 'upscale': True}
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+
+# Журнал медленных запросов: хранятся FLIGHT_RECORDER_SLOW_SIZE самых
+# долгих из запросов дольше FLIGHT_RECORDER_SLOW_MS и последние
+# FLIGHT_RECORDER_SAMPLE_SIZE из случайной доли остальных. Планы EXPLAIN
+# снимаются для FLIGHT_RECORDER_EXPLAIN самых долгих SQL запроса.
+FLIGHT_RECORDER_SLOW_MS = 500
+FLIGHT_RECORDER_SLOW_SIZE = 100
+FLIGHT_RECORDER_SAMPLE_RATE = 0.01
+FLIGHT_RECORDER_SAMPLE_SIZE = 200
+FLIGHT_RECORDER_EXPLAIN = 3
+
+# Метрики /metrics: каждый процесс пишет свои счётчики в отдельный
+# файл каталога, при выдаче они складываются. Каталог очищается при
+# деплое; None выключает метрики.
+METRICS_DIR = os.path.join(BASE_DIR, 'metrics')
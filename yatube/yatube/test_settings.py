@@ -0,0 +1,30 @@
+"""Настройки тестов: их берут manage.py test и pytest."""
+import atexit
+import os
+import shutil
+import tempfile
+
+from .settings import *  # noqa: F401, F403
+from .settings import CACHES
+
+# Тесты чистят кэш и не должны трогать файл кэша сайта: у них свой
+# файл во временном каталоге, удаляемом при выходе.
+TEST_CACHE_DIR = tempfile.mkdtemp(prefix='yatube-test-cache-')
+atexit.register(shutil.rmtree, TEST_CACHE_DIR, ignore_errors=True)
+CACHES = {'default': {
+    **CACHES['default'],
+    'LOCATION': os.path.join(TEST_CACHE_DIR, 'cache.sqlite3'),
+}}
+
+# Миниатюры создаются сразу после коммита в потоке запроса: фоновое
+# задание не переживёт тест и не станет писать в удалённый MEDIA_ROOT.
+# Тест пула включает его через override_settings.
+THUMBNAIL_WORKERS = 0
+
+# Журнал медленных запросов выключен: его записи попали бы
+# в assertNumQueries. Тесты журнала включают его сами.
+FLIGHT_RECORDER_SLOW_MS = None
+FLIGHT_RECORDER_SAMPLE_RATE = 0
+
+# Метрики выключены; тесты метрик включают их через override_settings.
+METRICS_DIR = None
@@ -3,11 +3,16 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import health_check, metrics_view
+
 urlpatterns = [
     path('about/', include('about.urls', namespace='about')),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
+    path('stats/', include('core.urls', namespace='core')),
+    path('metrics', metrics_view, name='metrics'),
+    path('health', health_check, name='health'),
     path('', include('posts.urls', namespace='posts')),
 ]
 